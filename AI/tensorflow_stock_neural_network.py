@@ -4,29 +4,35 @@
 
 # THIS IS NOT FINANCIAL ADVICE: You should always seek advice from a qualified financial advisor before making any financial decisions.
 
-import pandas as pd
+import os
+import sys
 from sklearn.model_selection import train_test_split
 import tensorflow as tf
 import numpy as np
 
-# Load dataset
-dataset = pd.read_csv('stock_financial_analysis.csv')
+# The feature columns and their store are shared with the collectors in Misc
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Misc"))
+from stock_features import BEATS_COLUMN, FEATURE_COLUMNS, TODAY_ONLY_COLUMNS, load_features
 
-# Prepare features and labels
-x = dataset.drop(columns=["Ticker", "Price Change Last Year", "S&P 500 Change Last Year", "Beats S&P 500 (1=yes, 0=no)"])
-y = dataset["Beats S&P 500 (1=yes, 0=no)"]
+# Load dataset, preferring the multi-year (ticker, year) panel built by Finance API/dataset_builder.py when there is one
+PANEL_STORE = 'stock_financial_panel.features'
+use_panel = os.path.exists(PANEL_STORE)
+dataset = load_features(PANEL_STORE if use_panel else 'stock_financial_analysis.features')
 
-# Ensure numerical values (convert and fill missing)
-x = x.apply(pd.to_numeric, errors='coerce').fillna(0)
+# The panel has no values for the columns Yahoo only has for today, so they are left out of training and prediction alike
+columns = [i for i, column in enumerate(FEATURE_COLUMNS) if not (use_panel and column in TODAY_ONLY_COLUMNS)]
 
-# Split dataset
-x_train, x_test, y_train, y_test = train_test_split(x, y, test_size=0.2, random_state=42)
+# Features and labels are float32 already, missing values count as 0
+x = np.nan_to_num(dataset.features[:, columns])
+y = np.asarray(dataset.labels[BEATS_COLUMN])
 
-# Convert to NumPy arrays and ensure float32 type
-x_train = np.array(x_train, dtype=np.float32)
-x_test = np.array(x_test, dtype=np.float32)
-y_train = np.array(y_train, dtype=np.float32)
-y_test = np.array(y_test, dtype=np.float32)
+# Split dataset. With several years the newest one is held out, so the model is tested on a year it has never seen
+years = dataset.labels.get("Year")
+if years is not None and len(np.unique(years)) > 1:
+    test = years == years.max()
+    x_train, x_test, y_train, y_test = x[~test], x[test], y[~test], y[test]
+else:
+    x_train, x_test, y_train, y_test = train_test_split(x, y, test_size=0.2, random_state=42)
 
 # Print shape of x_train to verify it's (num_samples, num_features)
 print("x_train shape:", x_train.shape)  # Debugging step
@@ -56,3 +62,13 @@ loss, accuracy = model.evaluate(x_test, y_test)
 # Print the results clearly
 print(f"Test Loss: {loss:.4f}")
 print(f"Test Accuracy: {accuracy:.4f}")
+
+# Run the model on this month's data from current_market_data.py, load_features guarantees the same columns in the same order
+# (and `columns` picks the ones the model was trained on)
+CURRENT_STORE = 'new_stock_data.features'
+if os.path.exists(CURRENT_STORE):
+    current = load_features(CURRENT_STORE)
+    probabilities = model.predict(np.nan_to_num(current.features[:, columns])).ravel()
+    print("\nMost likely to beat the S&P 500:")
+    for i in np.argsort(-probabilities)[:10]:
+        print(f"{current.tickers[i]}: {probabilities[i]:.2%}")
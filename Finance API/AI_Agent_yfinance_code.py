@@ -3,12 +3,12 @@
 import yfinance as yf
 import pandas as pd
 
+from constituents import load_sp500_tickers
+
 # Define the stock universe (e.g., S&P 500 tickers)
 def get_sp500_tickers():
-    sp500_url = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
-    tables = pd.read_html(sp500_url)
-    df = tables[0]
-    return df['Symbol'].tolist()
+    # Local snapshot, refreshed from Wikipedia once a month (see constituents.py)
+    return load_sp500_tickers()
 
 # Calculate Earnings Yield and Return on Capital for each stock
 def calculate_magic_formula_metrics(tickers):
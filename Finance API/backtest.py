@@ -0,0 +1,244 @@
+# Point-in-time backtest of the F-Score and Magic Formula screens.
+# At every rebalance date both screens are rebuilt for the whole universe from the fundamentals store (fundamentals_store.py),
+# using only the fiscal periods that had been reported by then (period end + REPORT_LAG), and market caps from the price on that day.
+# The picks are then held equal weight until the next rebalance, with the returns taken from a cached panel of daily closes.
+#
+# Note: the universe is whatever the store holds (today's S&P 500 by default), so delisted companies are missing and the results are
+# flattered by survivorship. Sector and country come from the latest profiles.
+#
+# Usage:
+#   python backtest.py [--start 2015-04-01] [--end 2025-04-01] [--months 12] [--top 20] [--min-fscore 7] [--lag 90] [--csv out.csv]
+
+from __future__ import annotations
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+import statement_cache
+from concurrent_fetch import DEFAULT_WORKERS
+from fscore_panel import StatementPanel, f_scores, latest_two
+from fundamentals_store import STORE_ITEMS, FundamentalsStore
+from request_governor import GOVERNOR
+from run_metrics import METRICS
+from screens import COUNTRY, EXCLUDED_SECTORS, MIN_MARKET_CAP
+
+# Days between a fiscal period's end and the date its statements are assumed to be public (10-Ks are due 60-90 days after year end)
+REPORT_LAG = int(os.getenv("REPORT_LAG_DAYS", "90"))
+
+# The price panel is cached like `info`: the history doesn't change, but the last few days do
+PRICE_TTL = statement_cache.INFO_TTL
+PRICE_KEY = "backtest"
+BATCH_SIZE = 100
+# Requested dates often aren't trading days (Jan 1, weekends, holidays), so the cached panel may start or end up to this much inside them
+PRICE_SLACK = pd.Timedelta(days=7)
+
+ITEMS = [name for names in STORE_ITEMS.values() for name in names]
+
+
+def load_panel(store: FundamentalsStore, tickers: Sequence[str]) -> StatementPanel:
+    return StatementPanel.from_long(store.read(columns=ITEMS, tickers=tickers), ITEMS).with_tickers(list(tickers))
+
+
+def load_prices(tickers: Sequence[str], start, end, key: str = PRICE_KEY) -> pd.DataFrame:
+    """
+    Daily closes (dates x tickers) between start and end, served from the disk cache when it covers the request.
+    Missing tickers are downloaded in batches with yf.download and merged into the cached panel stored under `key`.
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    cached = statement_cache.load(key, "prices", ttl=PRICE_TTL)
+    if cached is not None and (cached.index.min() > start + PRICE_SLACK or cached.index.max() < end - PRICE_SLACK):
+        # Doesn't reach far enough back (or forward), start over
+        cached = None
+
+    missing = [ticker for ticker in tickers if cached is None or ticker not in cached.columns]
+    if missing and not statement_cache.OFFLINE:
+        import yfinance as yf
+
+        frames = [] if cached is None else [cached]
+        for i in range(0, len(missing), BATCH_SIZE):
+            batch = missing[i:i + BATCH_SIZE]
+            closes = GOVERNOR.call(yf.download, batch, start=start, end=end + pd.Timedelta(days=1), auto_adjust=True, progress=False, threads=True)["Close"]
+            if isinstance(closes, pd.Series):
+                closes = closes.to_frame(batch[0])
+            frames.append(closes)
+        cached = pd.concat(frames, axis=1).sort_index()
+        statement_cache.save(key, "prices", cached)
+
+    if cached is None:
+        return pd.DataFrame(index=pd.DatetimeIndex([]), columns=list(tickers), dtype="float64")
+    return cached.reindex(columns=list(tickers)).loc[start:end]
+
+
+def rebalance_dates(start, end, months: int = 12) -> pd.DatetimeIndex:
+    return pd.date_range(pd.Timestamp(start), pd.Timestamp(end), freq=pd.DateOffset(months=months))
+
+
+def prices_at(closes: pd.DataFrame, dates: Sequence) -> np.ndarray:
+    """(date, ticker) array with the last close on or before each date, NaN before a ticker's first trade."""
+    filled = closes.ffill().to_numpy(dtype="float64")
+    rows = np.searchsorted(closes.index.to_numpy(), pd.DatetimeIndex(dates).to_numpy(), side="right") - 1
+    levels = np.full((len(rows), closes.shape[1]), np.nan)
+    levels[rows >= 0] = filled[rows[rows >= 0]]
+    return levels
+
+
+def _rank_key(values: np.ndarray) -> np.ndarray:
+    # Vectorized `x or -1` from the Magic Formula scripts
+    return np.where(np.isnan(values) | (values == 0), -1.0, values)
+
+
+def magic_formula_ranks(panel: StatementPanel, profiles: pd.DataFrame, prices: np.ndarray) -> np.ndarray:
+    """
+    Combined Magic Formula rank (1 = best) of every ticker in a point-in-time panel, NaN for the ones that don't qualify.
+    Same filters, formulas and tie-breaks as screens.magic_formula / screens.magic_formula_ranks, with the
+    market cap rebuilt from the price and the latest reported share count.
+    """
+    available = ~np.isnat(panel.dates)
+    current = np.argmax(available, axis=1)[:, None]
+
+    def latest(item: str) -> np.ndarray:
+        # Value in the newest reported period, like `.fillna(0).iloc[0]`
+        return np.nan_to_num(np.take_along_axis(panel.item(item), current, axis=1)[:, 0])
+
+    ebit, _, _ = latest_two(panel.item("EBIT"))
+    shares, _, _ = latest_two(panel.item("Ordinary Shares Number"))
+    total_debt = latest("Total Debt")
+    cash = latest("Cash And Cash Equivalents")
+    shareholders_equity = latest("Stockholders Equity")
+
+    market_cap = prices * shares
+    sector = profiles["sector"].to_numpy(dtype=object)
+    symbol = profiles["symbol"].fillna("").astype(str)
+    qualified = (
+        available.any(axis=1)
+        & ~np.isnan(ebit)
+        & (np.nan_to_num(market_cap) > MIN_MARKET_CAP)
+        & ~np.isin(sector, EXCLUDED_SECTORS)
+        & (profiles["country"].to_numpy(dtype=object) == COUNTRY)
+        & ~symbol.str.contains("ADR", regex=False).to_numpy()
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        enterprise_value = market_cap + total_debt - cash
+        invested_capital = total_debt + shareholders_equity - cash
+        ebit_to_ev = np.where(enterprise_value > 0, np.round(ebit / enterprise_value, 4), np.nan)
+        roic = np.where(invested_capital > 0, np.round(ebit / invested_capital, 3), np.nan)
+
+    index = np.flatnonzero(qualified)
+    ebit_key = -_rank_key(ebit_to_ev[index])
+    roic_key = -_rank_key(roic[index])
+
+    # np.lexsort sorts by the last key first, ties fall back to the universe order
+    ebit_rank = np.empty(len(index), dtype=np.int64)
+    ebit_rank[np.lexsort((index, ebit_key))] = np.arange(1, len(index) + 1)
+    roic_rank = np.empty(len(index), dtype=np.int64)
+    roic_rank[np.lexsort((index, ebit_key, roic_key))] = np.arange(1, len(index) + 1)
+    combined = np.empty(len(index), dtype=np.int64)
+    combined[np.lexsort((ebit_rank, ebit_rank + roic_rank))] = np.arange(1, len(index) + 1)
+
+    ranks = np.full(len(panel.tickers), np.nan)
+    ranks[index] = combined
+    return ranks
+
+
+def rebalance(panel: StatementPanel, profiles: pd.DataFrame, prices: np.ndarray, date, lag: int = REPORT_LAG) -> Dict[str, np.ndarray]:
+    """F-Score and combined Magic Formula rank of the whole universe with the data that was public on `date`."""
+    known = panel.as_of(pd.Timestamp(date) - pd.Timedelta(days=lag))
+    return {
+        "F-Score": f_scores(known)["F-Score"].to_numpy(),
+        "Magic Formula Rank": magic_formula_ranks(known, profiles, prices),
+    }
+
+
+def run_backtest(
+    panel: StatementPanel,
+    profiles: pd.DataFrame,
+    closes: pd.DataFrame,
+    dates: Sequence,
+    top: int = 20,
+    min_fscore: int = 7,
+    lag: int = REPORT_LAG,
+    max_workers: int = DEFAULT_WORKERS,
+) -> pd.DataFrame:
+    """
+    Return one row per holding period (rebalance date to the next one) with the equal-weight return of
+    the F-Score picks (score >= min_fscore), the Magic Formula top N and the whole universe.
+    """
+    dates = pd.DatetimeIndex(dates)
+    profiles = profiles.reindex(panel.tickers)
+    closes = closes.reindex(columns=panel.tickers)
+    levels = prices_at(closes, dates)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        forward = levels[1:] / levels[:-1] - 1
+
+    # Every rebalance only reads the shared arrays, so they can run side by side
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as pool:
+        scores = list(pool.map(lambda i: rebalance(panel, profiles, levels[i], dates[i], lag), range(len(dates) - 1)))
+
+    rows = []
+    for i, score in enumerate(scores):
+        returns = forward[i]
+        portfolios = {
+            "F-Score": score["F-Score"] >= min_fscore,
+            "Magic Formula": score["Magic Formula Rank"] <= top,
+            "Universe": np.ones(len(returns), dtype=bool),
+        }
+        row = {"start": dates[i], "end": dates[i + 1]}
+        for name, picks in portfolios.items():
+            # Tickers without a price at either end of the period can't be held
+            held = picks & ~np.isnan(returns)
+            row[name] = returns[held].mean() if held.any() else np.nan
+            row[f"{name} Holdings"] = int(held.sum())
+        rows.append(row)
+
+    return pd.DataFrame(rows).set_index("start")
+
+
+def summarize(results: pd.DataFrame, months: int = 12) -> pd.DataFrame:
+    """Total return and annualized return of each strategy."""
+    summary = {}
+    for name in ("F-Score", "Magic Formula", "Universe"):
+        growth = (1 + results[name].fillna(0)).prod()
+        years = len(results) * months / 12
+        summary[name] = {"Total Return": growth - 1, "CAGR": growth ** (1 / years) - 1 if years else np.nan}
+    return pd.DataFrame(summary).T
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    today = pd.Timestamp.today().normalize()
+    parser = argparse.ArgumentParser(description="Backtest the F-Score and Magic Formula screens with point-in-time fundamentals.")
+    parser.add_argument("--start", default=str((today - pd.DateOffset(years=10)).date()))
+    parser.add_argument("--end", default=str(today.date()))
+    parser.add_argument("--months", type=int, default=12, help="months between rebalances")
+    parser.add_argument("--top", type=int, default=20, help="number of Magic Formula picks")
+    parser.add_argument("--min-fscore", type=int, default=7, help="lowest F-Score that is bought")
+    parser.add_argument("--lag", type=int, default=REPORT_LAG, help="days between a fiscal year end and its statements being public")
+    parser.add_argument("--csv", help="also save the per-period returns to this CSV file")
+    args = parser.parse_args(argv)
+
+    METRICS.start("backtest")
+    store = FundamentalsStore()
+    tickers = store.tickers
+    dates = rebalance_dates(args.start, args.end, args.months)
+    with METRICS.stage("load"):
+        panel = load_panel(store, tickers)
+        closes = load_prices(tickers, dates[0], dates[-1])
+
+    with METRICS.stage("rebalance"):
+        results = run_backtest(panel, store.profiles(), closes, dates, args.top, args.min_fscore, args.lag)
+    with pd.option_context("display.max_rows", None, "display.width", 200, "display.float_format", "{:.4f}".format):
+        print(results)
+        print(summarize(results, args.months))
+    if args.csv:
+        results.to_csv(args.csv)
+        print(f"Results saved to '{args.csv}'")
+    METRICS.finish()
+
+
+if __name__ == "__main__":
+    main()
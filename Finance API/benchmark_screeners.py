@@ -0,0 +1,302 @@
+# Offline benchmark for the Finance API screeners.
+# `record` downloads the yfinance payloads (info and the three annual statements) of a fixed ticker set once and saves them as fixtures.
+# `replay` then runs the F-Score, growth F-Score, Magic Formula, fixed-assets and combined scripts end to end against those fixtures,
+# with yf.Ticker swapped for a fixture-backed stand-in, so every run sees exactly the same data and no network latency (unless --latency simulates it).
+#
+# Usage:
+#   python benchmark_screeners.py record
+#   python benchmark_screeners.py replay [--latency 0.2] [--workers 8] [--repeat 3] [--json results.json] [--baseline old.json]
+
+from __future__ import annotations
+
+import argparse
+import ast
+import builtins
+import contextlib
+import io
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(HERE, "benchmark_fixtures")
+KINDS = ("info", "financials", "balance_sheet", "cashflow")
+
+# Fixed ticker set: a spread of sectors, some low P/B names so the F-Score prefilter has work to do, and a few with patchy statements
+BENCH_TICKERS = [
+    "AAPL", "MSFT", "GOOGL", "AMZN", "META", "NVDA", "INTC", "CSCO", "ORCL", "IBM",
+    "JNJ", "PFE", "MRK", "ABBV", "CVS", "UNH", "KO", "PEP", "PG", "WMT",
+    "XOM", "CVX", "COP", "F", "GM", "BA", "CAT", "DE", "UPS", "FDX",
+    "T", "VZ", "DIS", "CMCSA", "WBA", "BEN", "C", "BAC", "PARA", "VTRS",
+]
+
+# name -> (script, fed through input() instead of a ticker list)
+SCRIPTS = {
+    "fscore": ("yfinance_full_fscore.py", False),
+    "fscore_growth": ("yfinance_fscore_growth.py", True),
+    "magic_formula": ("yfinance_full_magic_formula.py", False),
+    "fixed_assets": ("yfinance_fixed_assets_magic_formula.py", True),
+    "combined": ("yfinance_combined_fs_and_mf.py", False),
+}
+
+
+def fixture_path(kind: str, ticker: str) -> str:
+    return os.path.join(FIXTURE_DIR, kind, f"{ticker.upper()}.pkl")
+
+
+def record(tickers: List[str]) -> None:
+    import yfinance as yf
+
+    for ticker in tickers:
+        stock = yf.Ticker(ticker)
+        for kind in KINDS:
+            try:
+                value = getattr(stock, kind)
+            except Exception as e:
+                print(f"Error processing {ticker} ({kind}): {e}")
+                continue
+            path = fixture_path(kind, ticker)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        print(f"Recorded {ticker}")
+
+
+class StageTimer:
+    """
+    Time spent reading fixtures ("fetch") and deserializing them ("parse"), summed over all threads, and the wall-clock
+    time during which at least one request was in flight ("io"). With concurrent fetching the summed times can be many
+    times the wall time, so only "io" is comparable with the script's total.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.fetch = 0.0
+        self.parse = 0.0
+        self.io = 0.0
+        self.requests = 0
+        self.in_flight = 0
+        self.busy_since = 0.0
+        self.last_access = None
+
+    def begin(self) -> None:
+        with self.lock:
+            if self.in_flight == 0:
+                self.busy_since = time.perf_counter()
+            self.in_flight += 1
+
+    def add(self, fetch: float, parse: float) -> None:
+        with self.lock:
+            self.fetch += fetch
+            self.parse += parse
+            self.requests += 1
+            self.last_access = time.perf_counter()
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self.io += self.last_access - self.busy_since
+
+
+TIMER = StageTimer()
+LATENCY = 0.0
+
+
+class FixtureTicker:
+    """Stand-in for yf.Ticker that serves the recorded payloads. Like yf.Ticker, each value is loaded once per instance."""
+
+    def __init__(self, ticker: str, *args, **kwargs):
+        self.ticker = ticker.upper()
+        self._values: Dict[str, Any] = {}
+
+    def _replay(self, kind: str) -> Any:
+        if kind in self._values:
+            return self._values[kind]
+
+        import pandas as pd
+
+        TIMER.begin()
+        start = time.perf_counter()
+        try:
+            with open(fixture_path(kind, self.ticker), "rb") as f:
+                payload = f.read()
+        except FileNotFoundError:
+            payload = None
+        if LATENCY:
+            time.sleep(LATENCY)
+        loaded = time.perf_counter()
+
+        value = pickle.loads(payload) if payload else ({} if kind == "info" else pd.DataFrame())
+        TIMER.add(loaded - start, time.perf_counter() - loaded)
+        self._values[kind] = value
+        return value
+
+    info = property(lambda self: self._replay("info"))
+    financials = property(lambda self: self._replay("financials"))
+    balance_sheet = property(lambda self: self._replay("balance_sheet"))
+    cashflow = property(lambda self: self._replay("cashflow"))
+
+
+def compile_script(script: str, tickers: List[str]):
+    """Compile a screener with its hardcoded ticker list (`tickers` or `prefilter`) replaced by the benchmark set."""
+    path = os.path.join(HERE, script)
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    replaced = False
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id in ("tickers", "prefilter") for t in node.targets):
+            node.value = ast.List(elts=[ast.Constant(ticker) for ticker in tickers], ctx=ast.Load())
+            replaced = True
+    if not replaced:
+        # Some scripts only have their list commented out, give them one
+        tree.body.insert(0, ast.parse(f"tickers = {tickers!r}").body[0])
+
+    return compile(ast.fix_missing_locations(tree), path, "exec")
+
+
+def run_script(name: str, tickers: List[str], measure_memory: bool = False) -> Dict[str, Any]:
+    import yfinance as yf
+    import request_governor
+    import statement_cache
+
+    script, interactive = SCRIPTS[name]
+    code = compile_script(script, tickers)
+    answers = iter(tickers + ["exit"])
+
+    TIMER.reset()
+    error = None
+    with contextlib.ExitStack() as stack:
+        # Replay the fixtures and keep the disk cache out of the measurement
+        stack.enter_context(_patched(yf, "Ticker", FixtureTicker))
+        stack.enter_context(_patched(statement_cache, "load", lambda *args, **kwargs: None))
+        stack.enter_context(_patched(statement_cache, "save", lambda *args, **kwargs: None))
+        # Fixtures aren't rate limited, --latency is the only simulated cost per request
+        stack.enter_context(_patched(request_governor.GOVERNOR.bucket, "rate", 0))
+        if interactive:
+            stack.enter_context(_patched(builtins, "input", lambda prompt="": next(answers)))
+        stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+
+        if measure_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            exec(code, {"__name__": "__main__", "__file__": os.path.join(HERE, script)})
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        end = time.perf_counter()
+        peak = tracemalloc.get_traced_memory()[1] if measure_memory else None
+        if measure_memory:
+            tracemalloc.stop()
+
+    total = end - start
+    # Wall clock: everything after the last data access is the ranking/reporting step, and the rest of the time
+    # before it that no request was in flight is scoring (fetch and parse are summed over threads, see StageTimer)
+    rank = end - TIMER.last_access if TIMER.last_access else 0.0
+    return {
+        "total": total,
+        "fetch": TIMER.fetch,
+        "parse": TIMER.parse,
+        "io": TIMER.io,
+        "score": max(total - rank - TIMER.io, 0.0),
+        "rank": rank,
+        "requests": TIMER.requests,
+        "tickers_per_sec": len(tickers) / total if total else float("inf"),
+        "peak_mb": peak / 2**20 if peak is not None else None,
+        "error": error,
+    }
+
+
+@contextlib.contextmanager
+def _patched(owner, name: str, value):
+    original = getattr(owner, name)
+    setattr(owner, name, value)
+    try:
+        yield
+    finally:
+        setattr(owner, name, original)
+
+
+def replay(names: List[str], tickers: List[str], repeat: int) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for name in names:
+        # Best of `repeat` timing runs, then one extra run under tracemalloc for the peak memory
+        runs = [run_script(name, tickers) for _ in range(repeat)]
+        best = min(runs, key=lambda run: run["total"])
+        best["peak_mb"] = run_script(name, tickers, measure_memory=True)["peak_mb"]
+        results[name] = best
+    return results
+
+
+def print_report(results: Dict[str, Dict[str, Any]]) -> None:
+    # total = io + score + rank on the wall clock, fetch* and parse* are summed over the fetching threads
+    print(f"{'screener':<15} {'total':>8} {'io':>8} {'score':>8} {'rank':>8} {'fetch*':>8} {'parse*':>8} {'tickers/s':>10} {'peak MB':>8}")
+    for name, r in results.items():
+        print(
+            f"{name:<15} {r['total']:>8.3f} {r['io']:>8.3f} {r['score']:>8.3f} {r['rank']:>8.3f} {r['fetch']:>8.3f} {r['parse']:>8.3f} "
+            f"{r['tickers_per_sec']:>10.1f} {r['peak_mb']:>8.1f}"
+        )
+        if r["error"]:
+            print(f"  ! {name} stopped early: {r['error']}")
+    print("* summed over threads, can exceed the total when requests overlap")
+
+
+def check_baseline(results: Dict[str, Dict[str, Any]], baseline_path: str, tolerance: float) -> bool:
+    """Compare against an earlier --json output, return False if any screener got slower than the tolerance allows."""
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)
+    ok = True
+    for name, r in results.items():
+        if name not in baseline:
+            continue
+        limit = baseline[name]["total"] * (1 + tolerance)
+        if r["total"] > limit:
+            print(f"REGRESSION {name}: {r['total']:.3f}s vs baseline {baseline[name]['total']:.3f}s")
+            ok = False
+    return ok
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Record and replay yfinance fixtures to benchmark the screeners offline.")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--screeners", nargs="+", choices=list(SCRIPTS), default=list(SCRIPTS))
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per request while replaying")
+    parser.add_argument("--workers", type=int, default=None, help="YF_WORKERS for the screeners that fetch concurrently")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="fail if slower than this earlier --json output")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    if args.mode == "record":
+        record(BENCH_TICKERS)
+        return 0
+
+    global LATENCY
+    LATENCY = args.latency
+    if args.workers is not None:
+        # Must be set before concurrent_fetch is imported by the first screener
+        os.environ["YF_WORKERS"] = str(args.workers)
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+    # The screeners' own run metrics would write a file per run and add their summary to the measured time
+    os.environ["YF_METRICS"] = "0"
+
+    results = replay(args.screeners, BENCH_TICKERS, args.repeat)
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline and not check_baseline(results, args.baseline, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+# Shared helper for the Finance API screeners that fetches many tickers at once instead of one after another.
+# Almost all of a screen's time is spent waiting on Yahoo, so overlapping the requests across a small thread pool cuts the wall-clock time by roughly the worker count.
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from request_governor import is_transient
+from run_metrics import METRICS
+
+T = TypeVar("T")
+U = TypeVar("U")
+
+# Number of tickers fetched at the same time (set YF_WORKERS=1 to go back to the old serial behaviour)
+DEFAULT_WORKERS = int(os.getenv("YF_WORKERS", "8"))
+
+# Extra passes for tickers that failed with a transient error (throttling, 5xx) even after the request governor's own retries
+REQUEUE_ROUNDS = 2
+
+
+def stage_name(func: Callable) -> str:
+    """Name a per-ticker function is recorded under by run_metrics ("ticker" for lambdas)."""
+    name = getattr(func, "__name__", "") or "ticker"
+    return "ticker" if name == "<lambda>" else name
+
+
+def map_tickers(
+    func: Callable[[str], T],
+    tickers: Iterable[str],
+    max_workers: int = DEFAULT_WORKERS,
+    on_result: Optional[Callable[[str, T], None]] = None,
+    stage: Optional[str] = None,
+    on_error: Optional[Callable[[str, Exception], None]] = None,
+) -> Dict[str, T]:
+    """
+    Run func(ticker) for every ticker on a bounded thread pool.
+    The returned dict keeps the order of `tickers` no matter which request finishes first,
+    and tickers whose call raised are printed and left out, like the old serial loops did.
+    Tickers that failed with a transient error (throttling, 5xx) are re-queued after the others, up to REQUEUE_ROUNDS times.
+    on_result(ticker, result) is called in the calling thread as soon as each ticker finishes, in completion order,
+    and on_error(ticker, exception) the same way for a ticker that is dropped (not for one that is re-queued).
+    Each call is recorded by run_metrics under `stage` (the function's name by default) when a run is being measured.
+    """
+    tickers = list(tickers)
+    stage = stage or stage_name(func)
+    func = METRICS.timed(func, stage)
+    results: Dict[str, T] = {}
+
+    pending = tickers
+    for attempt in range(REQUEUE_ROUNDS + 1):
+        retry: List[str] = []
+
+        def finished(ticker: str, call: Callable[[], T]) -> None:
+            try:
+                results[ticker] = call()
+            except Exception as e:
+                if is_transient(e) and attempt < REQUEUE_ROUNDS:
+                    retry.append(ticker)
+                    METRICS.record("requeue", stage=stage, ticker=ticker, error=type(e).__name__)
+                else:
+                    print(f"Error processing {ticker}: {e}")
+                    METRICS.record("failed", stage=stage, ticker=ticker, error=type(e).__name__)
+                    if on_error is not None:
+                        on_error(ticker, e)
+                return
+            if on_result is not None:
+                on_result(ticker, results[ticker])
+
+        if max_workers <= 1:
+            for ticker in pending:
+                finished(ticker, lambda: func(ticker))
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = {pool.submit(func, ticker): ticker for ticker in pending}
+                for future in as_completed(futures):
+                    finished(futures[future], future.result)
+
+        if not retry:
+            break
+        print(f"Re-queueing {len(retry)} tickers after transient errors")
+        # Keep the original order for the next round
+        retry_set = set(retry)
+        pending = [ticker for ticker in tickers if ticker in retry_set]
+
+    return {ticker: results[ticker] for ticker in tickers if ticker in results}
+
+
+def split_workers(first: Optional[int] = None, second: Optional[int] = None, total: int = DEFAULT_WORKERS) -> Tuple[int, int]:
+    """Threads for the two stages of run_pipeline, whatever isn't given explicitly shares what is left of `total` (at least one each)."""
+    if first is None and second is None:
+        first = (total + 1) // 2
+    if first is None:
+        first = total - second
+    if second is None:
+        second = total - first
+    return max(first, 1), max(second, 1)
+
+
+def run_pipeline(
+    tickers: Iterable[str],
+    first_stage: Callable[[str], Optional[T]],
+    second_stage: Callable[[T], U],
+    first_workers: Optional[int] = None,
+    second_workers: Optional[int] = None,
+    queue_size: Optional[int] = None,
+) -> Dict[str, U]:
+    """
+    Two-stage streaming version of map_tickers, e.g. prefilter -> scoring.
+    Whenever first_stage(ticker) returns something other than None, it goes straight to second_stage while
+    the first stage keeps running, so the two stages overlap instead of running back to back.
+    The queue between them is bounded, which makes a fast first stage wait for the second one instead of piling up results.
+    Results are returned in the order of `tickers`. Tickers that fail are printed and left out, after REQUEUE_ROUNDS more tries for transient errors.
+    Both stages can call Yahoo, so by default they split the DEFAULT_WORKERS budget between them instead of each taking all of it.
+    """
+    tickers = list(tickers)
+    first_workers, second_workers = split_workers(first_workers, second_workers)
+    first_name, second_name = stage_name(first_stage), stage_name(second_stage)
+    first_stage = METRICS.timed(first_stage, first_name)
+    todo: "queue.Queue[str]" = queue.Queue()
+    for ticker in tickers:
+        todo.put(ticker)
+    passed: "queue.Queue" = queue.Queue(maxsize=queue_size or 2 * second_workers)
+    results: Dict[str, U] = {}
+    attempts: Dict[str, int] = {}
+    attempts_lock = threading.Lock()
+    done = object()
+
+    def first_worker():
+        while True:
+            try:
+                ticker = todo.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                value = first_stage(ticker)
+            except Exception as e:
+                # Every first-stage thread counts requeues, so reading and bumping a count happens under the lock
+                with attempts_lock:
+                    requeue = is_transient(e) and attempts.get(ticker, 0) < REQUEUE_ROUNDS
+                    if requeue:
+                        attempts[ticker] = attempts.get(ticker, 0) + 1
+                if requeue:
+                    # Try again once the tickers already queued have had their turn
+                    todo.put(ticker)
+                    METRICS.record("requeue", stage=first_name, ticker=ticker, error=type(e).__name__)
+                else:
+                    print(f"Error processing {ticker}: {e}")
+                    METRICS.record("failed", stage=first_name, ticker=ticker, error=type(e).__name__)
+                continue
+            if value is not None:
+                passed.put((ticker, value))
+
+    def second_worker():
+        while True:
+            item = passed.get()
+            if item is done:
+                return
+            ticker, value = item
+            for attempt in range(REQUEUE_ROUNDS + 1):
+                start = time.perf_counter()
+                error = None
+                try:
+                    results[ticker] = second_stage(value)
+                except Exception as e:
+                    error = type(e).__name__
+                    if is_transient(e) and attempt < REQUEUE_ROUNDS:
+                        METRICS.record("requeue", stage=second_name, ticker=ticker, error=error)
+                        continue
+                    print(f"Error processing {ticker}: {e}")
+                    METRICS.record("failed", stage=second_name, ticker=ticker, error=error)
+                finally:
+                    # The second stage gets the first stage's value, not the ticker, so it is timed here instead of by METRICS.timed
+                    METRICS.record("task", stage=second_name, ticker=ticker, seconds=round(time.perf_counter() - start, 6), error=error)
+                break
+
+    first_threads = [threading.Thread(target=first_worker, daemon=True) for _ in range(max(first_workers, 1))]
+    second_threads = [threading.Thread(target=second_worker, daemon=True) for _ in range(max(second_workers, 1))]
+    for thread in first_threads + second_threads:
+        thread.start()
+
+    for thread in first_threads:
+        thread.join()
+    # The first stage is finished, tell every scoring thread to stop once the queue is empty
+    for _ in second_threads:
+        passed.put(done)
+    for thread in second_threads:
+        thread.join()
+
+    return {ticker: results[ticker] for ticker in tickers if ticker in results}
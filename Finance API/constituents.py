@@ -0,0 +1,98 @@
+# S&P 500 constituents without a Wikipedia round trip on every start.
+# The list is read from a local snapshot in YF_CACHE_DIR, seeded on the first start from the list shipped in
+# Misc/s&p_500_tickers_real.txt. Once the snapshot is older than REFRESH_DAYS it is refreshed from Wikipedia
+# (only then are pandas' HTML parsers needed). If that fails the snapshot is used as it is and the next try waits
+# RETRY_DAYS, with YF_OFFLINE=1 it is never refreshed.
+#
+# Usage:
+#   python constituents.py [--refresh]
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from typing import Iterable, List, Optional
+
+import statement_cache
+
+SHIPPED_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Misc", "s&p_500_tickers_real.txt")
+SNAPSHOT_FILE = os.path.join(statement_cache.CACHE_DIR, "constituents", "sp500.txt")
+SOURCE_URL = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
+
+# Index changes are announced a few times a quarter
+REFRESH_DAYS = float(os.getenv("CONSTITUENTS_REFRESH_DAYS", "30"))
+# Wait before trying again after a failed refresh, so an offline machine doesn't hit Wikipedia on every start
+RETRY_DAYS = float(os.getenv("CONSTITUENTS_RETRY_DAYS", "1"))
+
+
+def normalize_symbol(symbol: str) -> str:
+    """Yahoo spelling of a ticker: upper case, share classes with a dash (BRK.B -> BRK-B)."""
+    return symbol.strip().upper().replace(".", "-").replace("/", "-")
+
+
+def normalize_symbols(symbols: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(normalize_symbol(symbol) for symbol in symbols if symbol and symbol.strip()))
+
+
+def read_snapshot(path: str) -> List[str]:
+    with open(path, "r") as file:
+        return normalize_symbols(file.read().split())
+
+
+def write_snapshot(symbols: List[str], path: str = SNAPSHOT_FILE) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        file.write("\n".join(symbols) + "\n")
+    os.replace(tmp_path, path)
+
+
+def download_sp500_tickers() -> List[str]:
+    import pandas as pd
+
+    tables = pd.read_html(SOURCE_URL)
+    return normalize_symbols(tables[0]["Symbol"].astype(str))
+
+
+def snapshot_age(path: str = SNAPSHOT_FILE) -> Optional[float]:
+    """Age of the cached snapshot in days, None if there isn't one."""
+    try:
+        return (time.time() - os.path.getmtime(path)) / (24 * 60 * 60)
+    except OSError:
+        return None
+
+
+def refresh() -> List[str]:
+    symbols = download_sp500_tickers()
+    # A broken page shouldn't wipe out a good list
+    if len(symbols) < 400:
+        raise ValueError(f"Only {len(symbols)} constituents found on {SOURCE_URL}")
+    write_snapshot(symbols)
+    return symbols
+
+
+def load_sp500_tickers(refresh_days: float = REFRESH_DAYS) -> List[str]:
+    """S&P 500 tickers in Yahoo spelling from the local snapshot, refreshed first when it is due."""
+    age = snapshot_age()
+    if age is None:
+        # First start: the shipped list is recent enough, the refresh schedule starts from here
+        write_snapshot(read_snapshot(SHIPPED_FILE))
+    elif not statement_cache.OFFLINE and age > refresh_days:
+        try:
+            return refresh()
+        except Exception as e:
+            print(f"Could not refresh the S&P 500 list, using the local snapshot: {e}")
+            # Make the snapshot look RETRY_DAYS short of due so the next starts don't retry right away
+            due_in = min(RETRY_DAYS, refresh_days) * 24 * 60 * 60
+            stamp = time.time() - refresh_days * 24 * 60 * 60 + due_in
+            os.utime(SNAPSHOT_FILE, (stamp, stamp))
+    return read_snapshot(SNAPSHOT_FILE)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show or refresh the cached S&P 500 constituents.")
+    parser.add_argument("--refresh", action="store_true", help="download the list now instead of waiting for the schedule")
+    args = parser.parse_args()
+
+    tickers = refresh() if args.refresh else load_sp500_tickers()
+    print(f"{len(tickers)} constituents (snapshot: {SNAPSHOT_FILE})")
@@ -0,0 +1,214 @@
+# Multi-year training set for AI/tensorflow_stock_neural_network.py: one row per (ticker, year) instead of one row per ticker.
+# The label of a year is whether the stock beat the S&P 500 from its first to its last close of that year, computed for every
+# ticker and year at once from a single cached panel of daily closes. The features are rebuilt point-in-time from the fundamentals
+# store (fundamentals_store.py): only fiscal periods reported before the year started (period end + REPORT_LAG) and the price on
+# its first trading day are used, so a row never sees data from the year it is labelled with.
+#
+# Features that need estimates or market data Yahoo only has for today (TODAY_ONLY_COLUMNS) are left empty, and a year in
+# which a ticker had no reported fiscal period yet (Yahoo serves about four annual periods) has no row at all.
+# Like backtest.py, the universe is today's S&P 500, so the older years are flattered by survivorship.
+# The dataset is saved as a feature store (Misc/stock_features.py), with the same feature columns as the collectors.
+#
+# Usage:
+#   python dataset_builder.py [--years 5] [--lag 90] [--output stock_financial_panel.features]
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from backtest import ITEMS, REPORT_LAG, load_prices
+from concurrent_fetch import DEFAULT_WORKERS, map_tickers
+from fscore_panel import StatementPanel, latest_two
+from fundamentals_store import FundamentalsStore, load_universe
+from run_metrics import METRICS
+from ticker_snapshot import TickerSnapshot
+
+# The feature definitions are shared with the collectors in Misc
+MISC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Misc")
+if MISC_DIR not in sys.path:
+    sys.path.insert(0, MISC_DIR)
+
+from stock_features import BEATS_COLUMN, FEATURE_COLUMNS, TODAY_ONLY_COLUMNS, write_features
+
+INDEX = "^GSPC"
+PRICE_KEY = "dataset"
+DEFAULT_YEARS = 5
+LABEL_COLUMNS = ["Year", "Price Change Last Year", "S&P 500 Change Last Year", BEATS_COLUMN]
+
+# Companies without dividends or inventory have no such line in their statements, so a missing value is a zero.
+# That only holds for rows stored while the item was in STORE_ITEMS, older rows keep it missing (see FundamentalsStore.covers).
+ZERO_WHEN_ABSENT = ["Cash Dividends Paid", "Inventory"]
+
+
+def ensure_statements(store: FundamentalsStore, tickers: Sequence[str]) -> None:
+    """
+    Add the statements of tickers the store doesn't have yet, and rewrite the periods of tickers whose newest period was
+    stored before every item in ITEMS was (from the statement cache, or one download each).
+    """
+    stored = store.read(columns=[], tickers=tickers)
+    stored["covered"] = np.logical_and.reduce([store.covers(item, tickers) for item in ITEMS])
+    newest = stored.sort_values("date").groupby("ticker")["covered"].last()
+    missing = [ticker for ticker in tickers if not newest.get(ticker, False)]
+    if missing:
+        snapshots = map_tickers(lambda ticker: TickerSnapshot(ticker).prefetch(), missing, stage="prefetch")
+        store.add_statements(snapshots, overwrite=True)
+
+
+def load_panel(store: FundamentalsStore, tickers: Sequence[str]) -> StatementPanel:
+    """backtest.load_panel, with ZERO_WHEN_ABSENT items set to 0 where they were looked for and the statement had no line."""
+    frame = store.read(columns=ITEMS, tickers=tickers)
+    for item in ZERO_WHEN_ABSENT:
+        frame.loc[frame[item].isna() & store.covers(item, tickers), item] = 0.0
+    return StatementPanel.from_long(frame, ITEMS).with_tickers(list(tickers))
+
+
+def yearly_returns(closes: pd.DataFrame) -> pd.DataFrame:
+    """(year x ticker) change from the first to the last valid close of each calendar year."""
+    by_year = closes.groupby(closes.index.year)
+    first, last = by_year.first(), by_year.last()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (last - first) / first
+
+
+def first_closes(closes: pd.DataFrame) -> pd.DataFrame:
+    """(year x ticker) first valid close of each calendar year, the price the year's features are computed at."""
+    return closes.groupby(closes.index.year).first()
+
+
+def point_in_time_features(panel: StatementPanel, prices: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    The FEATURE_COLUMNS of Misc/stock_features.py for every ticker of a point-in-time panel, rebuilt from its
+    newest two reported fiscal years and the price at that date. Ratios Yahoo reports in percent are in percent here too.
+    """
+    def newest(item: str) -> np.ndarray:
+        return latest_two(panel.item(item))[0]
+
+    revenue, previous_revenue, _ = latest_two(panel.item("Total Revenue"))
+    net_income, previous_net_income, _ = latest_two(panel.item("Net Income"))
+    shares = newest("Ordinary Shares Number")
+    equity = newest("Stockholders Equity")
+    total_debt = newest("Total Debt")
+    ebitda = newest("EBITDA")
+    current_liabilities = newest("Current Liabilities")
+    current_assets = newest("Current Assets")
+    # Dividends paid are negative in the cash flow statement (0 without any, NaN when not known, see ZERO_WHEN_ABSENT)
+    dividends = -newest("Cash Dividends Paid")
+
+    market_cap = prices * shares
+    enterprise_value = market_cap + np.nan_to_num(total_debt) - np.nan_to_num(newest("Cash And Cash Equivalents"))
+
+    def ratio(numerator, denominator, positive_only: bool = False):
+        valid = denominator > 0 if positive_only else denominator != 0
+        return np.where(valid, numerator / np.where(valid, denominator, 1), np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "Price-to-Book Ratio (P/B)": ratio(market_cap, equity, positive_only=True),
+            "Price-to-Sales Ratio (P/S)": ratio(market_cap, revenue, positive_only=True),
+            "Enterprise Value to EBITDA": ratio(enterprise_value, ebitda),
+            "Enterprise Value to Revenue": ratio(enterprise_value, revenue, positive_only=True),
+            # Yahoo has no trailing P/E for companies that lost money
+            "Trailing P/E Ratio": ratio(market_cap, net_income, positive_only=True),
+            "Gross Margin": ratio(newest("Gross Profit"), revenue),
+            "EBITDA Margin": ratio(ebitda, revenue),
+            "Operating Margin": ratio(newest("Operating Income"), revenue),
+            "Net Profit Margin": ratio(net_income, revenue),
+            "Return on Assets (ROA)": ratio(net_income, newest("Total Assets")),
+            "Return on Equity (ROE)": ratio(net_income, equity),
+            "Debt-to-Equity Ratio": ratio(total_debt, equity) * 100,
+            "Current Ratio": ratio(current_assets, current_liabilities),
+            "Quick Ratio": ratio(current_assets - newest("Inventory"), current_liabilities),
+            "Revenue Growth": ratio(revenue - previous_revenue, np.abs(previous_revenue)),
+            "Earnings Growth": ratio(net_income - previous_net_income, np.abs(previous_net_income)),
+            "Dividend Yield": ratio(dividends, market_cap, positive_only=True) * 100,
+            "Payout Ratio": ratio(dividends, net_income, positive_only=True),
+            **{column: np.full(len(prices), np.nan) for column in TODAY_ONLY_COLUMNS},
+        }
+
+
+def year_rows(panel: StatementPanel, year: int, returns: pd.DataFrame, starts: pd.DataFrame, lag: int = REPORT_LAG) -> pd.DataFrame:
+    """Labelled rows of one year for every ticker that traded during it and had reported a fiscal period before it started."""
+    tickers = panel.tickers
+    change = returns.loc[year].reindex(tickers).to_numpy(dtype="float64")
+    index_change = returns.at[year, INDEX]
+    traded = ~np.isnan(change) & ~np.isnan(index_change)
+
+    first_day = pd.Timestamp(year=year, month=1, day=1)
+    known = panel.as_of(first_day - pd.Timedelta(days=lag))
+    # Without any reported period every feature would be NaN, and the model would learn from all-zero inputs
+    reported = ~np.isnat(known.dates).all(axis=1)
+    features = point_in_time_features(known, starts.loc[year].reindex(tickers).to_numpy(dtype="float64"))
+
+    frame = pd.DataFrame({
+        "Ticker": tickers,
+        "Year": year,
+        "Price Change Last Year": change,
+        "S&P 500 Change Last Year": index_change,
+        BEATS_COLUMN: (change > index_change).astype(int),
+        # Same columns in the same order as the collectors', a feature missing here fails instead of shifting the rest
+        **{column: features[column] for column in FEATURE_COLUMNS},
+    })
+    return frame[traded & reported]
+
+
+def build_dataset(
+    tickers: Sequence[str],
+    years: Sequence[int],
+    store: Optional[FundamentalsStore] = None,
+    lag: int = REPORT_LAG,
+    max_workers: int = DEFAULT_WORKERS,
+) -> pd.DataFrame:
+    store = store or FundamentalsStore()
+    tickers = list(tickers)
+    years = sorted(years)
+
+    ensure_statements(store, tickers)
+    panel = load_panel(store, tickers)
+
+    # One price panel covers every year, the index comes along in the same download
+    start, end = pd.Timestamp(year=years[0], month=1, day=1), pd.Timestamp(year=years[-1], month=12, day=31)
+    closes = load_prices(tickers + [INDEX], start, end, key=PRICE_KEY)
+    returns = yearly_returns(closes).reindex(years)
+    starts = first_closes(closes).reindex(years)
+
+    # Every year only reads the shared panel and price tables, so they can run side by side
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as pool:
+        frames = list(pool.map(lambda year: year_rows(panel, year, returns, starts, lag), years))
+    return pd.concat(frames, ignore_index=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    this_year = pd.Timestamp.today().year
+    parser = argparse.ArgumentParser(description="Build a (ticker, year) labelled dataset for the stock neural network.")
+    parser.add_argument("--years", type=int, default=DEFAULT_YEARS, help="number of finished calendar years to label")
+    parser.add_argument("--lag", type=int, default=REPORT_LAG, help="days between a fiscal year end and its statements being public")
+    parser.add_argument("--tickers", nargs="+", help="tickers to include (default: the universe file)")
+    parser.add_argument("--output", default="stock_financial_panel.features", help="where to save the dataset")
+    args = parser.parse_args(argv)
+
+    METRICS.start("dataset_builder")
+    tickers = [ticker.upper() for ticker in args.tickers] if args.tickers else load_universe()
+    years = list(range(this_year - args.years, this_year))
+    dataset = build_dataset(tickers, years, lag=args.lag)
+
+    write_features(
+        args.output, dataset["Ticker"], dataset[FEATURE_COLUMNS].to_numpy(dtype="float32"),
+        dataset[LABEL_COLUMNS].to_numpy(dtype="float32"), LABEL_COLUMNS, run_key=f"{years[0]}-{years[-1]}",
+    )
+    counts = dataset.groupby("Year").size()
+    print(f"Dataset saved to '{args.output}': {len(dataset)} rows, " + ", ".join(f"{year}: {count}" for year, count in counts.items()))
+    empty = [year for year in years if year not in counts.index]
+    if empty:
+        print(f"No statements were reported before {', '.join(map(str, empty))}, lower --years to skip them")
+    METRICS.finish()
+
+
+if __name__ == "__main__":
+    main()
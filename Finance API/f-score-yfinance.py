@@ -144,8 +144,8 @@ for ticker, score in results.items():
         score_groups[score] = []
     score_groups[score].append(ticker)
 
-# Sort the score groups by score (from highest to lowest)
-sorted_score_groups = sorted(score_groups.items(), key=lambda x: x[0], reverse=True)
+# Sort the score groups by score (from highest to lowest), "Data unavailable" last
+sorted_score_groups = sorted(score_groups.items(), key=lambda x: x[0] if isinstance(x[0], int) else -1, reverse=True)
 
 # Display the sorted groups
 for score, tickers in sorted_score_groups:
@@ -0,0 +1,262 @@
+# Vectorized Piotroski F-Score engine.
+# Instead of scoring one ticker at a time, every ticker's statements are stacked into one panel (line item x ticker x fiscal period)
+# and each of the nine signals is computed for the whole universe at once with NumPy, using NaN masks where the old scripts relied on KeyError/IndexError.
+# The rules are the same as the per-ticker loop in yfinance_full_fscore.py, so both give the same scores.
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from line_items import line_item_index
+
+# Line items the F-Score reads, grouped by the statement they come from
+FSCORE_ITEMS: Dict[str, List[str]] = {
+    "financials": ["Net Income", "Gross Profit", "Total Revenue"],
+    "balance_sheet": ["Total Assets", "Current Assets", "Current Liabilities", "Long Term Debt", "Ordinary Shares Number"],
+    "cashflow": ["Operating Cash Flow"],
+}
+
+# The growth variant reads the same lines ('Total Current Assets' is resolved to 'Current Assets' by line_items.py)
+GROWTH_ITEMS: Dict[str, List[str]] = FSCORE_ITEMS
+
+# Same line items read from the quarterly statements, for the trailing twelve month (TTM) mode
+QUARTERLY_FSCORE_ITEMS: Dict[str, List[str]] = {f"quarterly_{kind}": names for kind, names in FSCORE_ITEMS.items()}
+
+# Income and cash flow lines are summed over four quarters for TTM, balance sheet lines are read at the quarter end
+FLOW_ITEMS = ["Net Income", "Gross Profit", "Total Revenue", "Operating Cash Flow"]
+
+# Day ranges that count as four consecutive quarters (first to last quarter end) and as one year between two TTM periods
+QUARTER_SPAN_DAYS = (240, 310)
+YEAR_GAP_DAYS = (330, 400)
+
+SIGNALS = [
+    "Positive ROA",
+    "Improving ROA",
+    "Positive CFO",
+    "CFO > ROA",
+    "Improving Current Ratio",
+    "Lower Long Term Debt",
+    "No Dilution",
+    "Improving Gross Margin",
+    "Improving Asset Turnover",
+]
+
+
+def statements_to_long(stocks: Mapping[str, object], items: Mapping[str, List[str]] = FSCORE_ITEMS) -> pd.DataFrame:
+    """
+    Flatten yfinance-style statements into one long table with a row per (ticker, fiscal date) and a column per line item.
+    `stocks` maps a ticker to anything with `financials`, `balance_sheet` and `cashflow` attributes (yf.Ticker, CachedTicker, TickerSnapshot).
+    """
+    columns = [name for names in items.values() for name in names]
+    tickers, dates, rows = [], [], []
+    for ticker, stock in stocks.items():
+        # One row of values per fiscal date, filled in statement by statement
+        by_date: Dict[pd.Timestamp, np.ndarray] = {}
+        offset = 0
+        for kind, names in items.items():
+            statement = getattr(stock, kind, None)
+            if statement is not None and not statement.empty:
+                # Labels are resolved through the alias index, missing line items simply become NaN here
+                block = line_item_index(statement).rows(names)
+                for j, date in enumerate(pd.to_datetime(statement.columns)):
+                    row = by_date.setdefault(date, np.full(len(columns), np.nan))
+                    row[offset:offset + len(names)] = block[:, j]
+            offset += len(names)
+
+        for date, row in by_date.items():
+            tickers.append(ticker)
+            dates.append(date)
+            rows.append(row)
+
+    frame = pd.DataFrame(np.array(rows).reshape(len(rows), len(columns)), columns=columns)
+    frame.insert(0, "date", pd.to_datetime(pd.Series(dates, dtype="object")))
+    frame.insert(0, "ticker", tickers)
+    return frame
+
+
+class StatementPanel:
+    """
+    Dense (line item, ticker, period) array of statement values.
+    Period 0 is each ticker's most recent fiscal date, period 1 the one before it and so on; unused slots are NaN.
+    """
+
+    def __init__(self, tickers: List[str], items: List[str], values: np.ndarray, dates: np.ndarray):
+        self.tickers = tickers
+        self.items = items
+        self.values = values
+        self.dates = dates
+        self._item_index = {item: i for i, item in enumerate(items)}
+
+    @classmethod
+    def from_long(cls, frame: pd.DataFrame, items: Optional[Iterable[str]] = None) -> "StatementPanel":
+        """Build a panel from a long table with `ticker` and `date` columns plus one column per line item."""
+        if items is None:
+            items = [column for column in frame.columns if column not in ("ticker", "date")]
+        items = list(items)
+
+        # Tickers keep the order they first appear in, which keeps results deterministic
+        codes, tickers = pd.factorize(frame["ticker"])
+        dates = pd.to_datetime(frame["date"]).to_numpy("datetime64[ns]")
+        order = np.lexsort((-dates.astype("int64"), codes))
+        codes = codes[order]
+        dates = dates[order]
+
+        # Position of each row inside its ticker (0 = newest period)
+        slots = np.arange(len(codes)) - np.searchsorted(codes, codes)
+        n_periods = max(int(slots.max()) + 1 if len(slots) else 0, 2)
+
+        values = np.full((len(items), len(tickers), n_periods), np.nan)
+        raw = frame.reindex(columns=items).to_numpy(dtype="float64", na_value=np.nan)[order]
+        values[:, codes, slots] = raw.T
+
+        panel_dates = np.full((len(tickers), n_periods), np.datetime64("NaT"), dtype="datetime64[ns]")
+        panel_dates[codes, slots] = dates
+
+        return cls(list(tickers), items, values, panel_dates)
+
+    @classmethod
+    def from_statements(cls, stocks: Mapping[str, object], items: Mapping[str, List[str]] = FSCORE_ITEMS) -> "StatementPanel":
+        all_items = [name for names in items.values() for name in names]
+        panel = cls.from_long(statements_to_long(stocks, items), all_items)
+        # Keep tickers that had no statements at all so they still show up (with a score of 0)
+        if panel.tickers != list(stocks):
+            panel = panel.with_tickers(list(stocks))
+        return panel
+
+    def with_tickers(self, tickers: List[str]) -> "StatementPanel":
+        """Return a panel reordered to `tickers`, with all-NaN rows for tickers it doesn't have."""
+        position = {ticker: i for i, ticker in enumerate(self.tickers)}
+        index = np.array([position.get(ticker, -1) for ticker in tickers], dtype=int)
+        found = index >= 0
+
+        values = np.full((len(self.items), len(tickers), self.values.shape[2]), np.nan)
+        values[:, found] = self.values[:, index[found]]
+        dates = np.full((len(tickers), self.dates.shape[1]), np.datetime64("NaT"), dtype="datetime64[ns]")
+        dates[found] = self.dates[index[found]]
+        return StatementPanel(list(tickers), self.items, values, dates)
+
+    def as_of(self, date) -> "StatementPanel":
+        """
+        Point-in-time view: only fiscal periods ending on or before `date` are kept, later ones become NaN (and NaT).
+        latest_two skips the NaN periods, so scoring this panel uses the newest periods that existed at that date.
+        """
+        known = self.dates <= np.datetime64(pd.Timestamp(date), "ns")
+        values = np.where(known, self.values, np.nan)
+        dates = np.where(known, self.dates, np.datetime64("NaT"))
+        return StatementPanel(self.tickers, self.items, values, dates)
+
+    def item(self, name: str) -> np.ndarray:
+        """(ticker, period) values of one line item, all NaN when no company reports it."""
+        i = self._item_index.get(name)
+        if i is None:
+            return np.full(self.values.shape[1:], np.nan)
+        return self.values[i]
+
+
+def latest_two(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    For every row return its two newest non-NaN values and whether it had at least two.
+    This is the vectorized version of `series.dropna().sort_index(ascending=False).iloc[0]` / `.iloc[1]`.
+    """
+    valid = ~np.isnan(values)
+    # A stable sort on the "is missing" flag moves the valid periods to the front without changing their order
+    order = np.argsort(~valid, axis=1, kind="stable")[:, :2]
+    packed = np.take_along_axis(values, order, axis=1)
+    return packed[:, 0], packed[:, 1], valid.sum(axis=1) >= 2
+
+
+def ttm_panel(quarterly: StatementPanel, years: int = 2, flow_items: Iterable[str] = FLOW_ITEMS) -> StatementPanel:
+    """
+    Turn a panel of quarterly statements into trailing twelve month periods: period 0 is the TTM ending at the newest quarter,
+    period 1 the TTM ending four quarters before it, and so on. Flow items are rolling four quarter sums and balance items the
+    value at the quarter end. A period is NaN unless its four quarters are consecutive and it lies a year after the next one,
+    so yfinance's usual five quarters of income statement are enough for the current TTM but not for the year-ago one.
+    """
+    n_slots = max(quarterly.values.shape[2], 4 * years)
+    pad = n_slots - quarterly.values.shape[2]
+    values = np.pad(quarterly.values, ((0, 0), (0, 0), (0, pad)), constant_values=np.nan)
+    dates = np.pad(quarterly.dates, ((0, 0), (0, pad)), constant_values=np.datetime64("NaT"))
+    periods = np.arange(years) * 4
+
+    # Sum of slots p..p+3 for every slot p, NaN if any of the four quarters is missing
+    windows = np.lib.stride_tricks.sliding_window_view(values, 4, axis=2)
+    sums = windows.sum(axis=3)[:, :, periods]
+
+    # Missing quarter ends (NaT) come out far outside both day ranges
+    span = (dates[:, periods] - dates[:, periods + 3]).astype("timedelta64[D]").astype("float64")
+    consecutive = (span >= QUARTER_SPAN_DAYS[0]) & (span <= QUARTER_SPAN_DAYS[1])
+    gap = (dates[:, periods[:-1]] - dates[:, periods[1:]]).astype("timedelta64[D]").astype("float64")
+    one_year = (gap >= YEAR_GAP_DAYS[0]) & (gap <= YEAR_GAP_DAYS[1])
+    # An older period only counts if every newer period is a year apart from the one after it
+    valid = consecutive & np.column_stack([np.ones(len(dates), dtype=bool), np.cumprod(one_year, axis=1).astype(bool)])
+
+    flows = set(flow_items)
+    ttm_values = np.where(np.array([item in flows for item in quarterly.items])[:, None, None], sums, values[:, :, periods])
+    ttm_values = np.where(valid[None], ttm_values, np.nan)
+    ttm_dates = np.where(valid, dates[:, periods], np.datetime64("NaT"))
+    return StatementPanel(quarterly.tickers, quarterly.items, ttm_values, ttm_dates)
+
+
+def _signals(panel: StatementPanel, current_assets: str, current_liabilities: str) -> np.ndarray:
+    """The nine F-Score signals as a (ticker, signal) 0/1 array."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        net_income = panel.item("Net Income")
+        total_assets = panel.item("Total Assets")
+        total_revenue = panel.item("Total Revenue")
+
+        # ROA and operating cash flow, all four points need two years of ROA and a CFO value
+        roa, previous_roa, has_roa = latest_two(net_income / total_assets)
+        cfo_values = panel.item("Operating Cash Flow")
+        has_cfo = ~np.isnan(cfo_values).all(axis=1)
+        cfo = np.take_along_axis(cfo_values, np.argmax(~np.isnan(cfo_values), axis=1)[:, None], axis=1)[:, 0]
+        roa_block = has_roa & has_cfo
+
+        current_ratio, previous_current_ratio, has_current_ratio = latest_two(panel.item(current_assets) / panel.item(current_liabilities))
+        debt_ratio, previous_debt_ratio, has_debt_ratio = latest_two(panel.item("Long Term Debt") / total_assets)
+        shares, previous_shares, has_shares = latest_two(panel.item("Ordinary Shares Number"))
+        gross_margin, previous_gross_margin, has_gross_margin = latest_two(panel.item("Gross Profit") / total_revenue)
+        turnover, previous_turnover, has_turnover = latest_two(total_revenue / total_assets)
+
+        return np.column_stack([
+            roa_block & (roa > 0),
+            roa_block & (roa > previous_roa),
+            roa_block & (cfo > 0),
+            roa_block & (cfo > roa),
+            has_current_ratio & (current_ratio > previous_current_ratio),
+            has_debt_ratio & (debt_ratio < previous_debt_ratio),
+            has_shares & (shares <= previous_shares),
+            has_gross_margin & (gross_margin > previous_gross_margin),
+            has_turnover & (turnover > previous_turnover),
+        ]).astype(np.int8)
+
+
+def f_scores(panel: StatementPanel) -> pd.DataFrame:
+    """Return the nine F-Score signals (0/1) and their total for every ticker in the panel."""
+    signals = _signals(panel, "Current Assets", "Current Liabilities")
+    result = pd.DataFrame(signals, index=pd.Index(panel.tickers, name="ticker"), columns=SIGNALS)
+    result["F-Score"] = signals.sum(axis=1)
+    return result
+
+
+def growth_f_scores(panel: StatementPanel) -> pd.DataFrame:
+    """
+    Growth-adjusted F-Score from yfinance_fscore_growth.py: the nine signals plus a point for year over year revenue growth (out of 10).
+    """
+    signals = _signals(panel, "Current Assets", "Current Liabilities")
+    revenue, previous_revenue, has_revenue = latest_two(panel.item("Total Revenue"))
+    signals = np.column_stack([signals, (has_revenue & (revenue > previous_revenue)).astype(np.int8)])
+
+    result = pd.DataFrame(signals, index=pd.Index(panel.tickers, name="ticker"), columns=SIGNALS + ["Revenue Growth"])
+    result["Growth F-Score"] = signals.sum(axis=1)
+    return result
+
+
+def ttm_f_scores(quarterly: StatementPanel) -> pd.DataFrame:
+    """
+    F-Score on trailing twelve month figures: the newest TTM compared with the TTM four quarters earlier.
+    `quarterly` is a panel of the quarterly statements, e.g. StatementPanel.from_statements(snapshots, QUARTERLY_FSCORE_ITEMS).
+    """
+    return f_scores(ttm_panel(quarterly))
@@ -0,0 +1,300 @@
+# Local columnar store for the statement line items the F-Score and Magic Formula screeners use.
+# Every column is a flat binary file of float64 values (plus int32 ticker codes and int32 fiscal dates) that is memory-mapped on read,
+# so a screener only touches the columns it asks for and loading the whole S&P 500 takes milliseconds and no network at all.
+# Each row also records which line items were looked for when it was written (the int32 `items` column, an index into meta["item_sets"]),
+# so a NaN can be told apart: the statement didn't have the line, or the row was stored before the item was added to STORE_ITEMS.
+#
+# Run this file directly to download (or read from the cache) the statements for the universe in Misc/s&p_500_tickers_real.txt and append them to the store.
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+STORE_DIR = os.getenv("FUNDAMENTALS_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".fundamentals")
+UNIVERSE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Misc", "s&p_500_tickers_real.txt")
+
+# Every line item read by the F-Score and Magic Formula scripts and the training dataset builder, grouped by the statement they come from
+STORE_ITEMS: Dict[str, List[str]] = {
+    "financials": ["Net Income", "Gross Profit", "Total Revenue", "EBIT", "EBITDA", "Operating Income"],
+    "balance_sheet": [
+        "Total Assets", "Current Assets", "Current Liabilities", "Long Term Debt", "Ordinary Shares Number",
+        "Total Debt", "Cash And Cash Equivalents", "Stockholders Equity", "Inventory",
+        "Land And Improvements", "Properties", "Machinery Furniture Equipment", "Accumulated Depreciation", "Working Capital",
+    ],
+    "cashflow": ["Operating Cash Flow", "Cash Dividends Paid"],
+}
+
+# Quarterly statements are kept in their own store, Yahoo only serves the last five or so quarters and the TTM F-Score needs eight
+QUARTERLY_STORE_DIR = os.path.join(STORE_DIR, "quarterly")
+QUARTERLY_ITEMS: Dict[str, List[str]] = {f"quarterly_{kind}": names for kind, names in STORE_ITEMS.items()}
+
+# `info` fields the screeners filter on, kept as one row per ticker (the latest values only)
+PROFILE_NUMBERS = ["marketCap", "priceToBook"]
+PROFILE_TEXT = ["symbol", "sector", "country"]
+
+ITEM_DTYPE = "<f8"
+# Ticker code, fiscal date in days since 1970-01-01, and item set (1-based index into meta["item_sets"], 0 = written before they were tracked)
+KEY_DTYPES = {"ticker": "<i4", "date": "<i4", "items": "<i4"}
+
+
+def column_file(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_") + ".bin"
+
+
+def load_universe(path: str = UNIVERSE_FILE) -> List[str]:
+    with open(path, "r") as file:
+        return [line.strip() for line in file.readlines() if line.strip()]
+
+
+class FundamentalsStore:
+    """
+    Append-only table with one row per (ticker, fiscal date) and one float64 column per line item.
+    """
+
+    def __init__(self, path: str = STORE_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.meta = self._read_json("meta.json", {"rows": 0, "tickers": [], "columns": {}})
+        self.meta.setdefault("item_sets", [])
+        self._codes = {ticker: code for code, ticker in enumerate(self.meta["tickers"])}
+
+    def _read_json(self, name: str, default):
+        try:
+            with open(os.path.join(self.path, name), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    def _write_json(self, name: str, value) -> None:
+        tmp_path = os.path.join(self.path, f"{name}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, os.path.join(self.path, name))
+
+    def _column(self, name: str) -> np.ndarray:
+        """Memory-map one column, limited to the rows recorded in meta.json."""
+        dtype = np.dtype(KEY_DTYPES.get(name, ITEM_DTYPE))
+        rows = self.meta["rows"]
+        file = self.meta["columns"].get(name)
+        if file is None:
+            # Column added after these rows were written
+            return np.full(rows, np.nan, dtype=dtype) if dtype.kind == "f" else np.zeros(rows, dtype=dtype)
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, file), dtype=dtype, mode="r", shape=(rows,))
+
+    def _column_path(self, name: str, rows: int) -> str:
+        """File of a column, created (and back-filled for the `rows` written before it existed) the first time it is used."""
+        file = self.meta["columns"].get(name)
+        if file is None:
+            dtype = np.dtype(KEY_DTYPES.get(name, ITEM_DTYPE))
+            file = column_file(name)
+            self.meta["columns"][name] = file
+            with open(os.path.join(self.path, file), "wb") as f:
+                np.full(rows, np.nan if dtype.kind == "f" else 0, dtype=dtype).tofile(f)
+        return os.path.join(self.path, file)
+
+    def _item_set(self, names: List[str]) -> int:
+        names = sorted(names)
+        if names not in self.meta["item_sets"]:
+            self.meta["item_sets"].append(names)
+        return self.meta["item_sets"].index(names) + 1
+
+    def _keys(self, frame: pd.DataFrame) -> np.ndarray:
+        codes = np.array([self._code(ticker) for ticker in frame["ticker"]], dtype=np.int64)
+        days = pd.to_datetime(frame["date"]).to_numpy("datetime64[D]").astype(np.int64)
+        return (codes << 32) | (days & 0xFFFFFFFF)
+
+    def _code(self, ticker: str) -> int:
+        code = self._codes.get(ticker)
+        if code is None:
+            code = len(self.meta["tickers"])
+            self.meta["tickers"].append(ticker)
+            self._codes[ticker] = code
+        return code
+
+    def append(self, frame: pd.DataFrame) -> int:
+        """
+        Append a long table (`ticker`, `date` and one column per line item) to the store.
+        Periods that are already stored for a ticker are skipped, so re-adding the same statements is harmless.
+        Returns the number of new rows.
+        """
+        if frame.empty:
+            return 0
+
+        codes = np.array([self._code(ticker) for ticker in frame["ticker"]], dtype=KEY_DTYPES["ticker"])
+        days = pd.to_datetime(frame["date"]).to_numpy("datetime64[D]").astype(KEY_DTYPES["date"])
+
+        # Skip (ticker, date) pairs we already have, and duplicates inside the frame itself
+        keys = (codes.astype(np.int64) << 32) | (days.astype(np.int64) & 0xFFFFFFFF)
+        existing = (self._column("ticker").astype(np.int64) << 32) | (self._column("date").astype(np.int64) & 0xFFFFFFFF)
+        _, first = np.unique(keys, return_index=True)
+        keep = np.zeros(len(keys), dtype=bool)
+        keep[first] = True
+        keep &= ~np.isin(keys, existing)
+        if not keep.any():
+            self._write_json("meta.json", self.meta)
+            return 0
+
+        rows = self.meta["rows"]
+        items = [name for name in frame.columns if name not in KEY_DTYPES]
+        new_columns = {"ticker": codes[keep], "date": days[keep], "items": np.full(int(keep.sum()), self._item_set(items))}
+        for name in items:
+            new_columns[name] = pd.to_numeric(frame[name], errors="coerce").to_numpy(dtype=ITEM_DTYPE)[keep]
+
+        # Columns that this frame doesn't have still need a value for the new rows
+        for name in self.meta["columns"]:
+            if name not in new_columns:
+                new_columns[name] = np.full(int(keep.sum()), np.nan, dtype=ITEM_DTYPE)
+
+        for name, values in new_columns.items():
+            dtype = np.dtype(KEY_DTYPES.get(name, ITEM_DTYPE))
+            with open(self._column_path(name, rows), "r+b") as f:
+                # Drop anything past the recorded row count (left over from an interrupted append)
+                f.truncate(rows * dtype.itemsize)
+                f.seek(0, os.SEEK_END)
+                values.astype(dtype).tofile(f)
+
+        # Only count the new rows once every column has them
+        self.meta["rows"] = rows + int(keep.sum())
+        self._write_json("meta.json", self.meta)
+        return int(keep.sum())
+
+    def update(self, frame: pd.DataFrame) -> int:
+        """
+        Like append, but periods that are already stored are overwritten with the frame's line items (and their item set)
+        instead of skipped. Used to back-fill line items added to STORE_ITEMS after the rows were written.
+        Returns the number of rows overwritten, new periods are appended.
+        """
+        if frame.empty:
+            return 0
+        keys = self._keys(frame)
+        rows = self.meta["rows"]
+        existing = (self._column("ticker").astype(np.int64) << 32) | (self._column("date").astype(np.int64) & 0xFFFFFFFF)
+        positions = pd.Index(existing).get_indexer(keys) if rows else np.full(len(keys), -1)
+        matched = positions >= 0
+
+        if matched.any():
+            items = [name for name in frame.columns if name not in KEY_DTYPES]
+            values = {"items": np.full(int(matched.sum()), self._item_set(items))}
+            for name in items:
+                values[name] = pd.to_numeric(frame[name], errors="coerce").to_numpy(dtype=ITEM_DTYPE)[matched]
+            for name, column in values.items():
+                dtype = np.dtype(KEY_DTYPES.get(name, ITEM_DTYPE))
+                mapped = np.memmap(self._column_path(name, rows), dtype=dtype, mode="r+", shape=(rows,))
+                mapped[positions[matched]] = column.astype(dtype)
+                mapped.flush()
+                del mapped
+            self._write_json("meta.json", self.meta)
+
+        self.append(frame[~matched])
+        return int(matched.sum())
+
+    def covers(self, item: str, tickers: Optional[Iterable[str]] = None) -> np.ndarray:
+        """
+        For the rows read() returns, whether `item` was looked for when the row was stored. Where it was, a NaN means the
+        statement has no such line. Where it wasn't (rows from before the item was in STORE_ITEMS), the value is unknown.
+        """
+        lookup = np.array([False] + [item in names for names in self.meta["item_sets"]])
+        ids = self._column("items")
+        if tickers is not None:
+            wanted = [self._codes[ticker] for ticker in tickers if ticker in self._codes]
+            ids = ids[np.isin(self._column("ticker"), wanted)]
+        return lookup[np.asarray(ids)]
+
+    def add_statements(self, stocks: Mapping[str, object], items: Mapping[str, List[str]] = STORE_ITEMS, overwrite: bool = False) -> int:
+        """
+        Append the statements of yf.Ticker-like objects (anything with `financials`, `balance_sheet` and `cashflow`).
+        Pass items=QUARTERLY_ITEMS to store their quarterly statements instead, and overwrite=True to rewrite periods
+        that are already stored (see update) instead of skipping them.
+        """
+        from fscore_panel import statements_to_long
+
+        frame = statements_to_long(stocks, items)
+        return self.update(frame) if overwrite else self.append(frame)
+
+    def update_profiles(self, infos: Mapping[str, dict]) -> None:
+        """Replace the stored profile (market cap, P/B, sector, ...) of each ticker with the latest `info`."""
+        profiles = self._read_json("profiles.json", {})
+        for ticker, info in infos.items():
+            if info:
+                profiles[ticker] = {field: info.get(field) for field in PROFILE_NUMBERS + PROFILE_TEXT}
+        self._write_json("profiles.json", profiles)
+
+    @property
+    def tickers(self) -> List[str]:
+        return list(self.meta["tickers"])
+
+    def read(self, columns: Optional[Iterable[str]] = None, tickers: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """
+        Return a long table with `ticker`, `date` and the requested line items.
+        Only the requested column files are mapped into memory.
+        """
+        columns = [name for name in self.meta["columns"] if name not in KEY_DTYPES] if columns is None else list(columns)
+        codes = self._column("ticker")
+        mask = slice(None)
+        if tickers is not None:
+            wanted = [self._codes[ticker] for ticker in tickers if ticker in self._codes]
+            mask = np.isin(codes, wanted)
+
+        names = np.array(self.meta["tickers"], dtype=object)
+        frame = pd.DataFrame({
+            "ticker": names[codes[mask]] if len(names) else np.empty(0, dtype=object),
+            "date": self._column("date")[mask].astype("datetime64[D]").astype("datetime64[ns]"),
+        })
+        for name in columns:
+            frame[name] = np.asarray(self._column(name)[mask])
+        return frame
+
+    def profiles(self) -> pd.DataFrame:
+        profiles = self._read_json("profiles.json", {})
+        frame = pd.DataFrame.from_dict(profiles, orient="index", columns=PROFILE_NUMBERS + PROFILE_TEXT)
+        frame[PROFILE_NUMBERS] = frame[PROFILE_NUMBERS].astype("float64")
+        return frame
+
+    def latest_dates(self) -> pd.Series:
+        """Most recent stored fiscal date of each ticker."""
+        frame = self.read(columns=[])
+        return frame.groupby("ticker", sort=False)["date"].max()
+
+    def statements(self, ticker: str) -> Dict[str, pd.DataFrame]:
+        """Rebuild yfinance-shaped statements (line items as rows, newest fiscal date first) for one ticker."""
+        frame = self.read(tickers=[ticker]).set_index("date").sort_index(ascending=False)
+        return {kind: frame.reindex(columns=items).dropna(how="all", axis=1).T for kind, items in STORE_ITEMS.items()}
+
+
+class StoredTicker:
+    """Offline stand-in for yf.Ticker that serves `info` and the statements from a FundamentalsStore."""
+
+    def __init__(self, ticker: str, store: Optional[FundamentalsStore] = None):
+        self.ticker = ticker
+        store = store or FundamentalsStore()
+        statements = store.statements(ticker)
+        self.financials = statements["financials"]
+        self.balance_sheet = statements["balance_sheet"]
+        self.cashflow = statements["cashflow"]
+        profiles = store.profiles()
+        self.info = profiles.loc[ticker].to_dict() if ticker in profiles.index else {}
+        # The store only keeps annual statements
+        self.quarterly_financials = pd.DataFrame()
+        self.quarterly_balance_sheet = pd.DataFrame()
+        self.quarterly_cashflow = pd.DataFrame()
+
+
+if __name__ == "__main__":
+    from concurrent_fetch import map_tickers
+    from ticker_snapshot import TickerSnapshot
+
+    universe = load_universe()
+    snapshots = map_tickers(lambda ticker: TickerSnapshot(ticker).prefetch(), universe)
+
+    store = FundamentalsStore()
+    added = store.add_statements(snapshots)
+    store.update_profiles({ticker: snapshot.info for ticker, snapshot in snapshots.items()})
+    print(f"Added {added} new fiscal periods for {len(snapshots)} tickers to {store.path}")
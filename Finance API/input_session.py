@@ -0,0 +1,103 @@
+# Shared plumbing for the interactive input tools (yfinance_input_fscore.py, yfinance_input_magic_formula.py).
+# A line can hold several tickers separated by spaces or commas. Every ticker starts downloading in the background as soon as
+# it is read off the line, scoring only collects those downloads, and the scores are saved to a session file so
+# restarting the tool remembers everything scored before.
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+import statement_cache
+from concurrent_fetch import DEFAULT_WORKERS, REQUEUE_ROUNDS
+from request_governor import is_transient
+from ticker_snapshot import TickerSnapshot
+
+SESSION_DIR = os.path.join(statement_cache.CACHE_DIR, "sessions")
+
+
+def parse_tickers(line: str) -> List[str]:
+    """Split a pasted line like 'aapl, msft  goog' into unique upper case tickers, keeping their order."""
+    return list(dict.fromkeys(part.upper() for part in re.split(r"[\s,;]+", line) if part))
+
+
+def _load_snapshot(ticker: str) -> TickerSnapshot:
+    snapshot = TickerSnapshot(ticker)
+    snapshot.info
+    return snapshot.prefetch()
+
+
+class InputSession:
+    """Scores kept across runs of one input tool, plus the background downloads of the tickers typed so far."""
+
+    def __init__(self, name: str, max_workers: int = DEFAULT_WORKERS):
+        self.path = os.path.join(SESSION_DIR, f"{name}.json")
+        self.max_workers = max_workers
+        self.scores: Dict[str, Any] = self._load()
+        self._pool = ThreadPoolExecutor(max_workers=max(max_workers, 1))
+        self._snapshots: Dict[str, Future] = {}
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r") as f:
+                scores = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # JSON has no tuples, the Magic Formula tool stores (EBIT/EV, ROCE) pairs
+        return {ticker: tuple(score) if isinstance(score, list) else score for ticker, score in scores.items()}
+
+    def save(self) -> None:
+        os.makedirs(SESSION_DIR, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.scores, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        self.scores.clear()
+        self.save()
+
+    def prefetch(self, tickers: List[str]) -> None:
+        """Start downloading `info` and the statements of each ticker in the background (once per ticker)."""
+        for ticker in tickers:
+            if ticker not in self._snapshots:
+                self._snapshots[ticker] = self._pool.submit(_load_snapshot, ticker)
+
+    def read(self, line: str) -> List[str]:
+        """The tickers of an entered line, each one already downloading by the time this returns."""
+        tickers = parse_tickers(line)
+        self.prefetch(tickers)
+        return tickers
+
+    def snapshot(self, ticker: str) -> TickerSnapshot:
+        self.prefetch([ticker])
+        try:
+            return self._snapshots[ticker].result()
+        except Exception:
+            # Forget the failed download so typing the ticker again retries it
+            self._snapshots.pop(ticker, None)
+            raise
+
+    def score(self, tickers: List[str], func: Callable[[TickerSnapshot], Any]) -> Dict[str, Any]:
+        """
+        Run func(snapshot) for every ticker once its download (started by read or prefetch) is done.
+        Downloads that failed with a transient error are started again, up to REQUEUE_ROUNDS times.
+        Tickers whose download or scoring raised are printed and left out of the result.
+        """
+        results: Dict[str, Any] = {}
+        for ticker in tickers:
+            for attempt in range(REQUEUE_ROUNDS + 1):
+                try:
+                    results[ticker] = func(self.snapshot(ticker))
+                except Exception as e:
+                    if is_transient(e) and attempt < REQUEUE_ROUNDS:
+                        continue
+                    print(f"Error processing {ticker}: {e}")
+                break
+        return results
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
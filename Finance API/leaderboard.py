@@ -0,0 +1,56 @@
+# Incremental Magic Formula ranking: results are inserted into already-sorted lists as each ticker finishes,
+# so the EBIT/EV, ROIC and combined top-N can be shown while a long screen is still running.
+# Ties are broken by each ticker's position in the original list, which makes the final ranks identical to
+# sorting the complete list afterwards (see screens.magic_formula_ranks) no matter in which order the results arrive.
+
+from __future__ import annotations
+
+import heapq
+from bisect import insort
+from typing import List, Optional, Tuple
+
+
+def _rank_key(value: Optional[float]) -> float:
+    # Same key as the scripts' `x or -1`: missing (and zero) values go to the bottom
+    return value or -1
+
+
+class MagicFormulaLeaderboard:
+
+    def __init__(self):
+        self._by_ebit_to_ev: List[Tuple[float, int, str, Optional[float]]] = []
+        self._by_roic: List[Tuple[float, float, int, str, Optional[float]]] = []
+
+    def __len__(self) -> int:
+        return len(self._by_ebit_to_ev)
+
+    def add(self, position: int, symbol: str, ebit_to_ev: Optional[float], roic: Optional[float]) -> None:
+        """Insert one company. `position` is its index in the ticker list and decides ties."""
+        insort(self._by_ebit_to_ev, (-_rank_key(ebit_to_ev), position, symbol, ebit_to_ev))
+        # ROIC ties fall back to the EBIT / EV order, just like sorting the EBIT / EV ranked list by ROIC
+        insort(self._by_roic, (-_rank_key(roic), -_rank_key(ebit_to_ev), position, symbol, roic))
+
+    def top_ebit_to_ev(self, n: int) -> List[Tuple[int, str, Optional[float]]]:
+        return [(rank, symbol, value) for rank, (_, _, symbol, value) in enumerate(self._by_ebit_to_ev[:n], 1)]
+
+    def top_roic(self, n: int) -> List[Tuple[int, str, Optional[float]]]:
+        return [(rank, symbol, value) for rank, (_, _, _, symbol, value) in enumerate(self._by_roic[:n], 1)]
+
+    def top_combined(self, n: Optional[int] = None) -> List[Tuple[str, int, int]]:
+        """(symbol, EBIT / EV rank, ROIC rank) with the lowest rank sum first, ties broken by the EBIT / EV rank."""
+        ebit_rankings = {symbol: rank for rank, (_, _, symbol, _) in enumerate(self._by_ebit_to_ev, 1)}
+        roic_rankings = {symbol: rank for rank, (_, _, _, symbol, _) in enumerate(self._by_roic, 1)}
+        combined = ((symbol, ebit_rank, roic_rankings[symbol]) for symbol, ebit_rank in ebit_rankings.items())
+        key = lambda x: (x[1] + x[2], x[1])
+        if n is None:
+            return sorted(combined, key=key)
+        # Only the top N are needed while the run is going, which avoids sorting everything
+        return heapq.nsmallest(n, combined, key=key)
+
+    def rankings(self):
+        """Final (EBIT / EV ranking, ROIC ranking, combined ranking), in the same format as screens.magic_formula_ranks."""
+        return self.top_ebit_to_ev(len(self)), self.top_roic(len(self)), self.top_combined()
+
+    def print_partial(self, n: int, screened: int, total: int) -> None:
+        leaders = ", ".join(f"{symbol} ({ebit_rank + roic_rank})" for symbol, ebit_rank, roic_rank in self.top_combined(n))
+        print(f"[{screened}/{total} screened, {len(self)} qualified] Top {n} so far: {leaders}")
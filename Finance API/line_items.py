@@ -0,0 +1,173 @@
+# Canonical names for the statement line items the screeners read, and the labels Yahoo has used for each of them.
+# A statement is indexed once: every canonical line item is resolved to the label the statement actually has and its row position,
+# and the mapping is cached for as long as the statement is alive. Scoring code then asks `has()` / `missing()` up front and reads rows
+# by position, instead of calling `.loc[label]` and catching the KeyError of every label that isn't there.
+
+from __future__ import annotations
+
+import threading
+import weakref
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Canonical line item -> labels to look for, in order of preference.
+# Older yfinance versions (and yfinance_fscore_growth.py) used the 'Total ...' spellings of the current assets and liabilities.
+LINE_ITEM_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "Net Income": ("Net Income",),
+    "Gross Profit": ("Gross Profit",),
+    "Total Revenue": ("Total Revenue",),
+    "EBIT": ("EBIT",),
+    "Total Assets": ("Total Assets",),
+    "Current Assets": ("Current Assets", "Total Current Assets"),
+    "Current Liabilities": ("Current Liabilities", "Total Current Liabilities"),
+    "Long Term Debt": ("Long Term Debt",),
+    "Ordinary Shares Number": ("Ordinary Shares Number",),
+    "Total Debt": ("Total Debt",),
+    "Cash And Cash Equivalents": ("Cash And Cash Equivalents",),
+    "Stockholders Equity": ("Stockholders Equity",),
+    "Land And Improvements": ("Land And Improvements",),
+    "Properties": ("Properties",),
+    "Machinery Furniture Equipment": ("Machinery Furniture Equipment",),
+    "Accumulated Depreciation": ("Accumulated Depreciation",),
+    "Working Capital": ("Working Capital",),
+    "Operating Cash Flow": ("Operating Cash Flow",),
+}
+
+# Any label of a line item -> its canonical name, so asking for an old spelling finds the current one too
+CANONICAL_NAMES: Dict[str, str] = {
+    label: name for name, labels in LINE_ITEM_ALIASES.items() for label in labels
+}
+
+
+def canonical_name(label: str) -> str:
+    return CANONICAL_NAMES.get(label, label)
+
+
+class MissingLineItems(KeyError):
+    """Raised by `LineItemIndex.require()` with every missing line item at once."""
+
+    def __init__(self, missing: List[str]):
+        super().__init__(", ".join(missing))
+        self.missing = missing
+
+    def __str__(self) -> str:
+        # KeyError would quote the message
+        return f"missing line items: {', '.join(self.missing)}"
+
+
+class LineItemIndex:
+    """
+    Row positions of the canonical line items in one statement (line items x fiscal dates, most recent first),
+    with the values kept as one float64 array so a row is read by position.
+    """
+
+    def __init__(self, statement: Optional[pd.DataFrame]):
+        if statement is None:
+            statement = pd.DataFrame()
+        self.columns = statement.columns
+        self.values = statement.to_numpy(dtype="float64", na_value=np.nan)
+
+        # First row of each label, some statements repeat a label
+        rows: Dict[str, int] = {}
+        for position, label in enumerate(statement.index):
+            rows.setdefault(label, position)
+
+        self.labels: Dict[str, str] = {}
+        self.positions: Dict[str, int] = {}
+        for name, labels in LINE_ITEM_ALIASES.items():
+            for label in labels:
+                if label in rows:
+                    self.labels[name] = label
+                    self.positions[name] = rows[label]
+                    break
+        # Labels without an alias entry are still found under their own name
+        for label, position in rows.items():
+            if label not in CANONICAL_NAMES:
+                self.labels.setdefault(label, label)
+                self.positions.setdefault(label, position)
+
+    def position(self, name: str) -> Optional[int]:
+        return self.positions.get(canonical_name(name))
+
+    def has(self, *names: str) -> bool:
+        return all(self.position(name) is not None for name in names)
+
+    def missing(self, names: Iterable[str]) -> List[str]:
+        return [name for name in names if self.position(name) is None]
+
+    def require(self, *names: str) -> None:
+        missing = self.missing(names)
+        if missing:
+            raise MissingLineItems(missing)
+
+    def row(self, name: str) -> Optional[np.ndarray]:
+        """Values of a line item across the fiscal dates, None if the statement doesn't have it."""
+        position = self.position(name)
+        return None if position is None else self.values[position]
+
+    def rows(self, names: List[str]) -> np.ndarray:
+        """Values of several line items as one (len(names), dates) block, NaN for the ones that are missing."""
+        block = np.full((len(names), len(self.columns)), np.nan)
+        for i, name in enumerate(names):
+            position = self.position(name)
+            if position is not None:
+                block[i] = self.values[position]
+        return block
+
+    def series(self, name: str) -> Optional[pd.Series]:
+        """Like `statement.loc[label]`, indexed by fiscal date."""
+        row = self.row(name)
+        return None if row is None else pd.Series(row, index=self.columns, name=canonical_name(name))
+
+    def latest(self, name: str) -> Optional[float]:
+        """Most recent non-NaN value, like `.loc[label].dropna().iloc[0]`, or None."""
+        row = self.row(name)
+        if row is None:
+            return None
+        present = np.flatnonzero(~np.isnan(row))
+        return float(row[present[0]]) if len(present) else None
+
+    def first(self, name: str, fill: float = 0.0) -> float:
+        """Value in the most recent column with NaN as `fill`, like `.loc[label].fillna(fill).iloc[0]`."""
+        row = self.row(name)
+        if row is None or not len(row) or np.isnan(row[0]):
+            return fill
+        return float(row[0])
+
+
+# id(statement) -> index, dropped again when the statement is garbage collected
+_INDEXES: Dict[int, LineItemIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def _forget(key: int) -> None:
+    with _INDEXES_LOCK:
+        _INDEXES.pop(key, None)
+
+
+def line_item_index(statement: Optional[pd.DataFrame]) -> LineItemIndex:
+    """The cached index of a statement, built the first time it is asked for."""
+    if statement is None:
+        return LineItemIndex(None)
+    key = id(statement)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+    if index is None:
+        index = LineItemIndex(statement)
+        with _INDEXES_LOCK:
+            if key not in _INDEXES:
+                _INDEXES[key] = index
+                weakref.finalize(statement, _forget, key)
+    return index
+
+
+def missing_line_items(stock, items: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """For {statement kind: line items}, the line items `stock` doesn't have, leaving out the statements that have them all."""
+    report = {}
+    for kind, names in items.items():
+        missing = line_item_index(getattr(stock, kind, None)).missing(names)
+        if missing:
+            report[kind] = missing
+    return report
@@ -0,0 +1,174 @@
+# Runs several screens in one pass over the universe: every ticker's info and statements are fetched once
+# and then used for the classic F-Score, the growth F-Score, the Magic Formula (EBIT/EV + ROIC) and the fixed-assets ROCE.
+# The output is one combined table, so running all four screens costs about the same as running one of the old scripts.
+# For large universes (Russell 3000, global lists) --processes splits the universe into chunks that are scored on all cores.
+# It defaults to 1 (everything in this process), and the worker processes share one YF_RATE budget between them.
+#
+# Usage:
+#   python multi_screener.py [--screens fscore growth magic fixed_assets] [--tickers AAPL MSFT ...] [--universe file] [--sort column] [--top 20] [--csv out.csv]
+#                            [--processes 8] [--chunk-size 250]
+
+from __future__ import annotations
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import screens
+from concurrent_fetch import map_tickers
+from fscore_panel import GROWTH_ITEMS, StatementPanel, f_scores, growth_f_scores
+from fundamentals_store import UNIVERSE_FILE, load_universe
+from request_governor import GOVERNOR
+from run_metrics import METRICS
+from ticker_snapshot import TickerSnapshot
+
+SCREENS = ["fscore", "growth", "magic", "fixed_assets"]
+
+# Column that marks the companies passing the Magic Formula filters until the chunks are ranked together
+QUALIFIED = "Magic Formula Qualified"
+
+
+def evaluate_ticker(ticker: str, selected: List[str]) -> Dict[str, object]:
+    """Fetch one ticker and run the per-ticker screens on it. The F-Scores are done later for the whole universe at once."""
+    snapshot = TickerSnapshot(ticker)
+    # The Magic Formula's profile filters only need info. A run that is only screening for it skips the statements
+    # of every ticker the filters reject, the other screens need them either way
+    needs_statements = any(screen in selected for screen in ("fscore", "growth", "fixed_assets")) or (
+        "magic" in selected and screens.passes_magic_formula_filters(snapshot.info)
+    )
+    if needs_statements:
+        snapshot.prefetch()
+    row: Dict[str, object] = {"snapshot": snapshot}
+
+    if "magic" in selected:
+        try:
+            row["magic"] = screens.magic_formula(snapshot)
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            print(f"Error processing {ticker}: {e}")
+            METRICS.record("error", stage="magic", ticker=ticker, error=type(e).__name__)
+    if "fixed_assets" in selected:
+        try:
+            row.update(screens.fixed_assets_roce(snapshot))
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            print(f"Error processing {ticker}: {e}")
+            METRICS.record("error", stage="fixed_assets", ticker=ticker, error=type(e).__name__)
+    return row
+
+
+def score_chunk(tickers: List[str], selected: List[str] = SCREENS) -> pd.DataFrame:
+    """
+    Per-ticker part of the screens for one chunk of the universe: F-Scores, Magic Formula ratios and fixed-assets ROCE.
+    Every value only depends on its own ticker, so chunks can be scored in separate processes and concatenated.
+    """
+    with METRICS.stage("fetch"):
+        rows = map_tickers(lambda ticker: evaluate_ticker(ticker, selected), tickers, stage="evaluate_ticker")
+    table = pd.DataFrame(index=pd.Index(list(rows), name="ticker"))
+    snapshots = {ticker: row["snapshot"] for ticker, row in rows.items()}
+
+    if "fscore" in selected or "growth" in selected:
+        with METRICS.stage("f-scores"):
+            panel = StatementPanel.from_statements(snapshots, GROWTH_ITEMS)
+            if "fscore" in selected:
+                table["F-Score"] = f_scores(panel)["F-Score"]
+            if "growth" in selected:
+                table["Growth F-Score"] = growth_f_scores(panel)["Growth F-Score"]
+
+    if "magic" in selected:
+        magic = {ticker: row["magic"] for ticker, row in rows.items() if row.get("magic")}
+        table[QUALIFIED] = pd.Series({ticker: ticker in magic for ticker in rows}, dtype="bool")
+        table["EBIT/EV"] = pd.Series({ticker: values["EBIT/EV"] for ticker, values in magic.items()}, dtype="float64")
+        table["ROIC"] = pd.Series({ticker: values["ROIC"] for ticker, values in magic.items()}, dtype="float64")
+
+    if "fixed_assets" in selected:
+        for column in ("EBIT/EV (fixed assets)", "ROCE"):
+            table[column] = pd.Series({ticker: row.get(column) for ticker, row in rows.items()}, dtype="float64")
+
+    return table
+
+
+def rank_magic_formula(table: pd.DataFrame) -> pd.DataFrame:
+    """Add the EBIT/EV, ROIC and combined ranks. Ranking needs the whole universe, so it runs after the chunks are merged."""
+    qualified = table[table.pop(QUALIFIED)]
+    qualified_companies = [
+        (ticker, None if pd.isna(ebit_to_ev) else ebit_to_ev, None if pd.isna(roic) else roic)
+        for ticker, ebit_to_ev, roic in zip(qualified.index, qualified["EBIT/EV"], qualified["ROIC"])
+    ]
+    ranked_ebit_to_ev, ranked_roic, combined_ranking = screens.magic_formula_ranks(qualified_companies)
+    table["EBIT/EV Rank"] = pd.Series({symbol: rank for rank, symbol, _ in ranked_ebit_to_ev}, dtype="Int64")
+    table["ROIC Rank"] = pd.Series({symbol: rank for rank, symbol, _ in ranked_roic}, dtype="Int64")
+    table["Combined Rank"] = pd.Series({symbol: ebit_rank + roic_rank for symbol, ebit_rank, roic_rank in combined_ranking}, dtype="Int64")
+    return table
+
+
+def init_worker(processes: int, metrics_run: Optional[str]) -> None:
+    """Set up a worker process: its own share of the request rate, and its own events file for the parent's run."""
+    GOVERNOR.share(processes)
+    METRICS.start_worker(metrics_run)
+
+
+def score_chunk_in_worker(tickers: List[str], selected: List[str] = SCREENS) -> Tuple[pd.DataFrame, Optional[Dict[str, object]]]:
+    """score_chunk for a worker process, also returning the run metrics counters of the chunk for the parent to merge."""
+    table = score_chunk(tickers, selected)
+    return table, METRICS.take_counters()
+
+
+def run(tickers: List[str], selected: List[str] = SCREENS, processes: int = 1, chunk_size: Optional[int] = None) -> pd.DataFrame:
+    """
+    Screen `tickers` and return one row per ticker.
+    With processes > 1 the universe is split into chunks that are scored on a process pool (parsing and scoring the
+    statements is CPU bound once they are cached). Chunks are merged in input order, so the table is the same either way.
+    """
+    if processes > 1 and len(tickers) > 1:
+        chunk_size = chunk_size or max(-(-len(tickers) // (processes * 4)), 1)
+        chunks = [tickers[i:i + chunk_size] for i in range(0, len(tickers), chunk_size)]
+        # Each worker has its own request governor, so they split YF_RATE instead of sending processes x YF_RATE requests per second.
+        # They also record their own events, and each chunk comes back with its metrics counters to add to this run's summary
+        initargs = (processes, METRICS.worker_run())
+        with METRICS.stage("score chunks"), ProcessPoolExecutor(max_workers=processes, initializer=init_worker, initargs=initargs) as pool:
+            results = list(pool.map(score_chunk_in_worker, chunks, [selected] * len(chunks)))
+        for _, counters in results:
+            METRICS.merge(counters)
+        table = pd.concat([table for table, _ in results])
+    else:
+        table = score_chunk(tickers, selected)
+
+    if "magic" in selected:
+        with METRICS.stage("rank"):
+            table = rank_magic_formula(table)
+    return table
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Evaluate several screens with a single download of each ticker.")
+    parser.add_argument("--screens", nargs="+", choices=SCREENS, default=SCREENS)
+    parser.add_argument("--tickers", nargs="+", help="tickers to screen (default: the universe file)")
+    parser.add_argument("--universe", default=UNIVERSE_FILE, help="text file with one ticker per line")
+    parser.add_argument("--sort", help="column to sort by (default: combined rank, then F-Score)")
+    parser.add_argument("--top", type=int, default=None, help="only print the first N rows")
+    parser.add_argument("--csv", help="also save the table to this CSV file")
+    parser.add_argument("--processes", type=int, default=1, help=f"score chunks of the universe on this many processes, sharing one request rate (default: 1, this machine has {os.cpu_count()} cores)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="tickers per chunk with --processes (default: about 4 chunks per process)")
+    args = parser.parse_args(argv)
+
+    METRICS.start("multi_screener")
+    tickers = [ticker.upper() for ticker in args.tickers] if args.tickers else load_universe(args.universe)
+    table = run(tickers, args.screens, args.processes, args.chunk_size)
+
+    sort = args.sort or next((column for column in ("Combined Rank", "F-Score", "Growth F-Score", "ROCE") if column in table), None)
+    if sort:
+        # Ranks read best-first from the top, scores and ratios from the highest
+        table = table.sort_values(sort, ascending="Rank" in sort, na_position="last", kind="stable")
+
+    with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 200):
+        print(table.head(args.top) if args.top else table)
+    if args.csv:
+        table.to_csv(args.csv)
+        print(f"Table saved to '{args.csv}'")
+    METRICS.finish()
+
+
+if __name__ == "__main__":
+    main()
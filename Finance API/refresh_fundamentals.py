@@ -0,0 +1,139 @@
+# Nightly refresh for the fundamentals store and the statement cache that only re-downloads statements when they can have changed.
+# `info` (prices, market cap, P/B and the next earnings date) is refreshed for every ticker, but a ticker's statements are only
+# fetched again once its next report date has passed or its newest stored fiscal period is more than a year old.
+
+from __future__ import annotations
+
+import datetime as dt
+import json
+import os
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import yfinance as yf
+
+import statement_cache
+from concurrent_fetch import map_tickers
+from fundamentals_store import QUARTERLY_ITEMS, FundamentalsStore, load_universe
+from run_metrics import METRICS
+
+# A fiscal year this old means a newer annual report should be out by now
+STALE_PERIOD = dt.timedelta(days=15 * 30)
+# ...but don't ask again more often than this for companies that report late or not at all
+STALE_RETRY = dt.timedelta(days=7)
+
+
+def next_report_date(info: Dict[str, Any]) -> Optional[dt.date]:
+    """Upcoming (or most recent) earnings date from `info`, if Yahoo has one."""
+    for field in ("earningsTimestampStart", "earningsTimestamp"):
+        timestamp = info.get(field)
+        if timestamp:
+            return dt.datetime.fromtimestamp(timestamp, dt.timezone.utc).date()
+    return None
+
+
+def needs_statements(entry: Optional[Dict[str, Any]], today: dt.date) -> bool:
+    """Decide from a ticker's refresh state whether its statements should be downloaded again."""
+    if not entry or not entry.get("last_fetch"):
+        return True
+
+    last_fetch = dt.date.fromisoformat(entry["last_fetch"])
+    # Nothing was stored last time (e.g. a fund without statements), try again once in a while
+    if not entry.get("latest_period"):
+        return today - last_fetch > STALE_RETRY
+
+    next_report = entry.get("next_report")
+    # A report came out since we last looked
+    if next_report and last_fetch < dt.date.fromisoformat(next_report) <= today:
+        return True
+
+    latest_period = dt.date.fromisoformat(entry["latest_period"])
+    return today - latest_period > STALE_PERIOD and today - last_fetch > STALE_RETRY
+
+
+class RefreshState:
+    """Per-ticker record of the newest fiscal period, the last statement download and the next report date."""
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, "r") as f:
+                self.entries: Dict[str, Dict[str, Any]] = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def refresh(tickers: List[str], store: Optional[FundamentalsStore] = None, quarterly_store: Optional[FundamentalsStore] = None) -> Dict[str, int]:
+    store = store or FundamentalsStore()
+    quarterly_store = quarterly_store or FundamentalsStore(os.path.join(store.path, "quarterly"))
+    state = RefreshState(os.path.join(store.path, "refresh_state.json"))
+    today = dt.date.today()
+
+    # One yf.Ticker per ticker for its info and all of its statements, each new one costs a session and crumb lookup
+    stocks: Dict[str, yf.Ticker] = {}
+
+    def fetch_info(ticker):
+        stocks[ticker] = yf.Ticker(ticker)
+        return statement_cache.download(ticker, "info", stocks[ticker])
+
+    # 1) info for everyone, it holds the prices and tells us when each company reports next
+    with METRICS.stage("info"):
+        infos = map_tickers(fetch_info, tickers, stage="info")
+        store.update_profiles(infos)
+
+    # 2) statements only for the tickers that can have new ones. This uses the report date saved last time,
+    # because once a report is out Yahoo's info already points at the following one
+    due = [ticker for ticker in tickers if needs_statements(state.entries.get(ticker), today)]
+    for ticker, info in infos.items():
+        report = next_report_date(info or {})
+        entry = state.entries.setdefault(ticker, {})
+        entry["next_report"] = report.isoformat() if report else entry.get("next_report")
+
+    # Annual and quarterly statements, the quarterly ones build up the history the TTM F-Score needs
+    kinds = statement_cache.STATEMENT_KINDS + statement_cache.QUARTERLY_KINDS
+
+    def fetch_statements(ticker):
+        stock = stocks.get(ticker) or yf.Ticker(ticker)
+        return {kind: statement_cache.download(ticker, kind, stock) for kind in kinds}
+
+    with METRICS.stage("statements"):
+        downloaded = map_tickers(fetch_statements, due)
+    with METRICS.stage("store"):
+        statements = {ticker: SimpleNamespace(**values) for ticker, values in downloaded.items()}
+        added = store.add_statements(statements)
+        added_quarters = quarterly_store.add_statements(statements, QUARTERLY_ITEMS)
+
+    latest = store.latest_dates()
+    for ticker in downloaded:
+        entry = state.entries.setdefault(ticker, {})
+        entry["last_fetch"] = today.isoformat()
+        if ticker in latest.index:
+            entry["latest_period"] = latest[ticker].date().isoformat()
+    state.save()
+
+    return {
+        "tickers": len(tickers),
+        "info_requests": len(tickers),
+        "statement_requests": len(due) * len(kinds),
+        "new_periods": added,
+        "new_quarters": added_quarters,
+    }
+
+
+if __name__ == "__main__":
+    start = time.time()
+    METRICS.start("refresh_fundamentals")
+    summary = refresh(load_universe())
+    print(
+        f"Refreshed {summary['tickers']} tickers in {time.time() - start:.1f}s: "
+        f"{summary['info_requests']} info requests, {summary['statement_requests']} statement requests, "
+        f"{summary['new_periods']} new fiscal periods, {summary['new_quarters']} new quarters"
+    )
+    METRICS.finish()
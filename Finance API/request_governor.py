@@ -0,0 +1,197 @@
+# Shared throttle for every request the Finance API screeners send to Yahoo.
+# A token bucket keeps the request rate under the provider's limit, throttled (429) and server (5xx) errors are retried with
+# exponential backoff and jitter, and when throttling keeps happening a circuit breaker pauses every worker for a while
+# instead of letting all of them hammer the API and fail. Tickers that still fail with a transient error are re-queued
+# by concurrent_fetch, so a throttled run no longer silently drops names from the ranking.
+
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Sustained requests per second and the burst allowed on top of it
+REQUEST_RATE = float(os.getenv("YF_RATE", "5"))
+REQUEST_BURST = int(os.getenv("YF_BURST", "10"))
+
+# Retries of a single request, and the backoff before the first retry (doubled after each one)
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+# This many throttled responses within BREAKER_WINDOW seconds pause all requests for BREAKER_COOLDOWN seconds
+BREAKER_THRESHOLD = 5
+BREAKER_WINDOW = 30.0
+BREAKER_COOLDOWN = 60.0
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def _network_errors() -> tuple:
+    """
+    Dropped connections and timeouts of every HTTP client yfinance may use. The requests and curl_cffi exceptions
+    derive from OSError, not from the built-in ConnectionError / TimeoutError, so they have to be listed themselves.
+    """
+    errors = [ConnectionError, TimeoutError]
+    try:
+        import requests.exceptions
+
+        errors += [requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError]
+    except ImportError:
+        pass
+    try:
+        import curl_cffi.requests.exceptions
+
+        errors += [curl_cffi.requests.exceptions.ConnectionError, curl_cffi.requests.exceptions.Timeout, curl_cffi.requests.exceptions.ChunkedEncodingError]
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+NETWORK_ERRORS = _network_errors()
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """HTTP status behind an exception from requests/curl_cffi, if there is one."""
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) or getattr(error, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_throttled(error: BaseException) -> bool:
+    message = str(error)
+    return (
+        type(error).__name__ == "YFRateLimitError"
+        or status_code(error) == 429
+        or "Too Many Requests" in message
+        or "Rate limited" in message
+    )
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    True for errors that are worth retrying later: throttling, 5xx responses, dropped connections and timeouts.
+    Errors that wrap another one (raise ... from, or raised while handling it) are transient when the original one is.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if is_throttled(error) or status_code(error) in RETRY_STATUS or isinstance(error, NETWORK_ERRORS):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float = REQUEST_RATE, capacity: int = REQUEST_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Opens after `threshold` throttled responses within `window` seconds and keeps every caller waiting for `cooldown` seconds."""
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, window: float = BREAKER_WINDOW, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.throttles: deque = deque()
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    def record_throttle(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self.throttles.append(now)
+            while self.throttles and now - self.throttles[0] > self.window:
+                self.throttles.popleft()
+            if len(self.throttles) >= self.threshold and now >= self.open_until:
+                self.open_until = now + self.cooldown
+                self.throttles.clear()
+                print(f"Yahoo is throttling requests, pausing all requests for {self.cooldown:.0f}s")
+
+    def wait(self) -> None:
+        while True:
+            with self._lock:
+                remaining = self.open_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+
+class RequestGovernor:
+    """Runs requests through the token bucket and circuit breaker, retrying transient failures with backoff."""
+
+    def __init__(self, bucket: Optional[TokenBucket] = None, breaker: Optional[CircuitBreaker] = None, max_retries: int = MAX_RETRIES):
+        self.bucket = bucket or TokenBucket()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+
+    def share(self, parts: int) -> None:
+        """
+        Keep this process to 1/parts of the request budget. Every process has its own governor, so the worker processes of
+        one run call this to stay under YF_RATE together instead of each using all of it.
+        """
+        parts = max(parts, 1)
+        self.bucket.rate /= parts
+        self.bucket.capacity = max(self.bucket.capacity // parts, 1)
+        self.bucket.tokens = min(self.bucket.tokens, self.bucket.capacity)
+
+    def call(self, func: Callable[..., T], *args, **kwargs) -> T:
+        attempt = 0
+        while True:
+            self.breaker.wait()
+            self.bucket.acquire()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if not is_transient(e) or attempt >= self.max_retries:
+                    raise
+                if is_throttled(e):
+                    self.breaker.record_throttle()
+                # Full jitter keeps the workers from retrying in lockstep
+                time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)))
+                attempt += 1
+
+
+# Shared by every screener in the process
+GOVERNOR = RequestGovernor()
+
+
+if __name__ == "__main__":
+    # Quick check of the error classification: python request_governor.py
+    for error_type in NETWORK_ERRORS:
+        assert is_transient(error_type("connection dropped")), error_type
+    try:
+        try:
+            raise NETWORK_ERRORS[-1]("read timed out")
+        except Exception as e:
+            raise RuntimeError("request failed") from e
+    except RuntimeError as e:
+        assert is_transient(e)
+    assert not is_transient(KeyError("Net Income"))
+    print(f"{len(NETWORK_ERRORS)} network error types are retried")
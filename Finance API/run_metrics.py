@@ -0,0 +1,264 @@
+# Run-level measurements for the Finance API batch screeners.
+# Once a script calls METRICS.start(name), every cache lookup, download, retry and per-ticker task is written as one JSON line to
+# YF_METRICS_DIR (by default a metrics folder in YF_CACHE_DIR), and a p50/p95/p99 summary is printed when the run ends.
+# Without start() recording is a no-op, so the interactive tools pay nothing for it. Set YF_METRICS=0 to turn it off for the batch runs too.
+# Worker processes record to their own <run>-<pid>.jsonl (start_worker) and send their counters back to the parent (take_counters / merge).
+#
+# One line per event, all with the seconds since the start of the run in "t":
+#   {"event": "cache", "ticker", "kind", "hit", "seconds", "bytes"}            disk cache lookup (bytes read on a hit)
+#   {"event": "download", "ticker", "kind", "seconds", "bytes", "retries", "error"}   request to Yahoo (bytes of the pickled result)
+#   {"event": "task", "stage", "ticker", "seconds", "error"}                   one call of a per-ticker function in concurrent_fetch
+#   {"event": "requeue" / "failed", "stage", "ticker", "error"}                ticker re-queued after a transient error / dropped
+#   {"event": "error", "stage", "ticker", "error"}                             a screen that couldn't score a ticker it still kept
+#   {"event": "stage", "name", "seconds"}                                      a whole phase of the script (fetch, score, rank...)
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {f"p{p}": 0.0 for p in PERCENTILES}
+    points = np.percentile(np.asarray(values, dtype="float64"), PERCENTILES)
+    return {f"p{p}": float(point) for p, point in zip(PERCENTILES, points)}
+
+
+class RunMetrics:
+    """Collects the events of one run, writes them as JSON lines and summarizes them at the end."""
+
+    def __init__(self):
+        self.enabled = False
+        self.name = ""
+        self.path: Optional[str] = None
+        self.started = 0.0
+        self.worker_files: List[str] = []
+        self._file = None
+        # Never read: holds a forked worker's copy of the parent's file so collecting it doesn't flush the parent's buffer again
+        self._inherited_file = None
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.cache = Counter()
+        self.bytes = Counter()
+        self.retries = 0
+        self.errors = Counter()
+        self.failed = 0
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.stages: Dict[str, float] = {}
+
+    def start(self, name: str, directory: Optional[str] = None) -> Optional[str]:
+        """Start recording a run, returns the path of its JSON lines file (None with YF_METRICS=0)."""
+        if os.getenv("YF_METRICS") == "0":
+            return None
+        if directory is None:
+            import statement_cache
+
+            directory = os.getenv("YF_METRICS_DIR") or os.path.join(statement_cache.CACHE_DIR, "metrics")
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._reset()
+            self.name = name
+            self.path = os.path.join(directory, f"{name}-{datetime.now():%Y%m%d-%H%M%S}.jsonl")
+            self.worker_files = []
+            self._file = open(self.path, "w")
+            self.started = time.monotonic()
+            self.enabled = True
+        atexit.register(self.finish)
+        return self.path
+
+    def worker_run(self) -> Optional[str]:
+        """What a worker process needs to record alongside this run (pass it to start_worker), None when not recording."""
+        return self.path if self.enabled else None
+
+    def start_worker(self, parent_path: Optional[str]) -> None:
+        """
+        Record the events of a worker process to <parent run>-<pid>.jsonl next to the parent's file (nothing if parent_path is None).
+        Worker processes don't run atexit handlers, so their counters are handed to the parent with take_counters() instead of finish().
+        """
+        self.detach()
+        if parent_path is None:
+            return
+        with self._lock:
+            # Keep the parent's file object referenced, see detach() and __init__
+            self._inherited_file = self._file
+            self._reset()
+            self.path = f"{os.path.splitext(parent_path)[0]}-{os.getpid()}.jsonl"
+            self._file = open(self.path, "w")
+            self.started = time.monotonic()
+            self.enabled = True
+
+    def detach(self) -> None:
+        """
+        Stop recording in a worker process that inherited a run from its parent, its events would interleave with the parent's.
+        The inherited file is left alone so its unflushed buffer isn't written a second time.
+        """
+        self.enabled = False
+
+    def record(self, event: str, **fields: Any) -> None:
+        if not self.enabled:
+            return
+        line = {"event": event, "t": round(time.monotonic() - self.started, 4), **fields}
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(json.dumps(line) + "\n")
+            self._count(event, fields)
+
+    def _count(self, event: str, fields: Dict[str, Any]) -> None:
+        error = fields.get("error")
+        if event == "cache":
+            self.cache["hit" if fields["hit"] else "miss"] += 1
+            self.bytes["cache"] += fields.get("bytes") or 0
+            self.latencies[f"cache {fields['kind']}"].append(fields["seconds"])
+        elif event == "download":
+            self.bytes["download"] += fields.get("bytes") or 0
+            self.retries += fields.get("retries", 0)
+            self.latencies[f"download {fields['kind']}"].append(fields["seconds"])
+            if error:
+                self.errors[error] += 1
+        elif event == "task":
+            self.latencies[f"task {fields['stage']}"].append(fields["seconds"])
+        elif event == "failed":
+            self.failed += 1
+            self.errors[error] += 1
+        elif event == "error":
+            self.errors[error] += 1
+        elif event == "stage":
+            self.stages[fields["name"]] = self.stages.get(fields["name"], 0.0) + fields["seconds"]
+
+    def take_counters(self) -> Optional[Dict[str, Any]]:
+        """Flush the events file and return the counters recorded so far, starting the next batch from zero. None when not recording."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._file.flush()
+            counters = {
+                "path": self.path,
+                "cache": dict(self.cache),
+                "bytes": dict(self.bytes),
+                "retries": self.retries,
+                "errors": dict(self.errors),
+                "failed": self.failed,
+                "latencies": dict(self.latencies),
+                "stages": dict(self.stages),
+            }
+            self._reset()
+        return counters
+
+    def merge(self, counters: Optional[Dict[str, Any]]) -> None:
+        """Add the counters of a worker process (from its take_counters()) to this run's totals."""
+        if not self.enabled or counters is None:
+            return
+        with self._lock:
+            if counters["path"] not in self.worker_files:
+                self.worker_files.append(counters["path"])
+            self.cache.update(counters["cache"])
+            self.bytes.update(counters["bytes"])
+            self.retries += counters["retries"]
+            self.errors.update(counters["errors"])
+            self.failed += counters["failed"]
+            for key, values in counters["latencies"].items():
+                self.latencies[key].extend(values)
+            # Worker stages overlap each other, so they are kept apart from the parent's wall-clock stages
+            for name, seconds in counters["stages"].items():
+                self.stages[f"{name} (workers)"] = self.stages.get(f"{name} (workers)", 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a phase of the script: `with METRICS.stage("score"): ...`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record("stage", name=name, seconds=round(time.perf_counter() - start, 6))
+
+    def timed(self, func: Callable[[str], T], stage: str) -> Callable[[str], T]:
+        """Wrap a per-ticker function so every call is recorded as a task with its latency and exception type."""
+        if not self.enabled:
+            return func
+
+        @wraps(func)
+        def wrapper(ticker):
+            start = time.perf_counter()
+            error = None
+            try:
+                return func(ticker)
+            except Exception as e:
+                error = type(e).__name__
+                raise
+            finally:
+                self.record("task", stage=stage, ticker=str(ticker), seconds=round(time.perf_counter() - start, 6), error=error)
+
+        return wrapper
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.cache["hit"] + self.cache["miss"]
+            return {
+                "run": self.name,
+                "seconds": round(time.monotonic() - self.started, 3),
+                "cache_hits": self.cache["hit"],
+                "cache_misses": self.cache["miss"],
+                "cache_hit_rate": self.cache["hit"] / lookups if lookups else 0.0,
+                "bytes_downloaded": self.bytes["download"],
+                "bytes_from_cache": self.bytes["cache"],
+                "retries": self.retries,
+                "failed_tickers": self.failed,
+                "errors": dict(self.errors),
+                "latency": {key: {"count": len(values), **percentiles(values)} for key, values in sorted(self.latencies.items())},
+                "stages": dict(self.stages),
+                "worker_files": list(self.worker_files),
+            }
+
+    def print_summary(self, summary: Dict[str, Any]) -> None:
+        print(f"\n--- Run Metrics ({summary['run']}, {summary['seconds']:.1f}s) ---")
+        print(
+            f"Cache: {summary['cache_hits']} hits, {summary['cache_misses']} misses ({summary['cache_hit_rate']:.0%} hit rate), "
+            f"{summary['bytes_from_cache'] / 1e6:.1f} MB read"
+        )
+        print(f"Network: {summary['bytes_downloaded'] / 1e6:.1f} MB downloaded, {summary['retries']} retries")
+        if summary["errors"]:
+            errors = ", ".join(f"{name} x{count}" for name, count in sorted(summary["errors"].items(), key=lambda x: -x[1]))
+            print(f"Errors: {errors} ({summary['failed_tickers']} tickers dropped)")
+        print(f"{'latency (ms)':<36}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for key, stats in summary["latency"].items():
+            print(f"{key:<36}{stats['count']:>7}{stats['p50'] * 1000:>10.1f}{stats['p95'] * 1000:>10.1f}{stats['p99'] * 1000:>10.1f}")
+        for name, seconds in summary["stages"].items():
+            print(f"stage {name}: {seconds:.2f}s")
+        print(f"Events written to {self.path}")
+        if summary["worker_files"]:
+            print(f"Worker events written to {len(summary['worker_files'])} files next to it")
+
+    def finish(self) -> Optional[Dict[str, Any]]:
+        """Stop recording, append the summary to the JSON lines file and print it. Safe to call more than once."""
+        if not self.enabled:
+            return None
+        summary = self.summary()
+        self.record("summary", **summary)
+        with self._lock:
+            self.enabled = False
+            self._file.close()
+            self._file = None
+        self.print_summary(summary)
+        return summary
+
+
+# Shared by every module in the process
+METRICS = RunMetrics()
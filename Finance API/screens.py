@@ -0,0 +1,150 @@
+# Per-ticker Magic Formula and fixed-assets ROCE calculations, shared by the runners that evaluate several screens at once.
+# The formulas and filters are the same as in yfinance_full_magic_formula.py and yfinance_fixed_assets_magic_formula.py.
+
+from __future__ import annotations
+
+import threading
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from line_items import line_item_index
+
+# Magic Formula universe filters
+EXCLUDED_SECTORS = ["Financial Services", "Utilities"]
+MIN_MARKET_CAP = 100_000_000
+COUNTRY = "United States"
+
+# Balance sheet lines of the fixed-assets ROCE, a company without any one of them can't be scored
+FIXED_ASSETS_ITEMS = [
+    'Total Debt', 'Land And Improvements', 'Properties', 'Machinery Furniture Equipment',
+    'Accumulated Depreciation', 'Working Capital', 'Cash And Cash Equivalents',
+]
+
+# The cheap Magic Formula checks that only need `info`, as (name, predicate) in the order they are applied.
+# The most selective check goes first (sector removes about a quarter of the S&P 500), so later checks see fewer companies.
+MAGIC_FORMULA_FILTERS: List[Tuple[str, Callable[[dict], bool]]] = [
+    ("sector", lambda info: info.get('sector', '') not in EXCLUDED_SECTORS),
+    ("market cap", lambda info: (info.get('marketCap', 0) or 0) > MIN_MARKET_CAP),
+    ("country", lambda info: info.get('country', '') == COUNTRY),
+    ("ADR", lambda info: "ADR" not in (info.get('symbol', '') or '')),
+]
+
+
+def passes_magic_formula_filters(info: dict) -> bool:
+    return all(predicate(info) for _, predicate in MAGIC_FORMULA_FILTERS)
+
+
+class FilterStats:
+    """Applies a list of (name, predicate) filters and counts how many companies each one removes."""
+
+    def __init__(self, filters: Sequence[Tuple[str, Callable[[dict], bool]]] = MAGIC_FORMULA_FILTERS):
+        self.filters = list(filters)
+        self.checked = [0] * len(self.filters)
+        self.passed = [0] * len(self.filters)
+        self._lock = threading.Lock()
+
+    def passes(self, info: dict) -> bool:
+        for i, (_, predicate) in enumerate(self.filters):
+            ok = predicate(info)
+            with self._lock:
+                self.checked[i] += 1
+                self.passed[i] += ok
+            if not ok:
+                return False
+        return True
+
+    def select(self, infos: Mapping[str, dict]) -> List[str]:
+        """Tickers whose `info` passes every filter, in the order of `infos`."""
+        return [ticker for ticker, info in infos.items() if self.passes(info or {})]
+
+    def print_report(self) -> None:
+        print("\n--- Profile Filters ---")
+        for (name, _), checked, passed in zip(self.filters, self.checked, self.passed):
+            removed = checked - passed
+            share = removed / checked if checked else 0
+            print(f"{name}: {checked} checked, {removed} removed ({share:.0%})")
+
+
+def magic_formula(snapshot) -> Optional[Dict[str, Optional[float]]]:
+    """
+    EBIT / EV and ROIC of one company, or None if it doesn't pass the Magic Formula filters.
+    Raises MissingLineItems (a KeyError) naming every missing line item, like the original script's KeyError.
+    """
+    info = snapshot.info
+    if not passes_magic_formula_filters(info):
+        return None
+
+    financials = line_item_index(snapshot.financials)
+    balance_sheet = line_item_index(snapshot.balance_sheet)
+    financials.require('EBIT')
+    balance_sheet.require('Total Debt', 'Cash And Cash Equivalents', 'Stockholders Equity')
+    market_cap = info.get('marketCap', 0)
+
+    ebit = financials.latest('EBIT')
+    if ebit is None:
+        raise IndexError("EBIT has no values")
+    total_debt = balance_sheet.first('Total Debt')
+    cash = balance_sheet.first('Cash And Cash Equivalents')
+    shareholders_equity = balance_sheet.first('Stockholders Equity')
+
+    # Calculate Enterprise Value and invested capital
+    enterprise_value = market_cap + total_debt - cash
+    invested_capital = total_debt + shareholders_equity - cash
+
+    return {
+        "EBIT/EV": round(ebit / enterprise_value, 4) if enterprise_value > 0 else None,
+        "ROIC": round(ebit / invested_capital, 3) if invested_capital > 0 else None,
+    }
+
+
+def fixed_assets_roce(snapshot) -> Dict[str, float]:
+    """EBIT / EV and return on fixed assets plus working capital, as in yfinance_fixed_assets_magic_formula.py."""
+    financials = line_item_index(snapshot.financials)
+    balance_sheet = line_item_index(snapshot.balance_sheet)
+    financials.require('EBIT')
+    balance_sheet.require(*FIXED_ASSETS_ITEMS)
+
+    ebit = financials.latest('EBIT')
+    if ebit is None:
+        raise IndexError("EBIT has no values")
+    total_debt = balance_sheet.first('Total Debt')
+    land_improvements = balance_sheet.first('Land And Improvements')
+    properties = balance_sheet.first('Properties')
+    equipment = balance_sheet.first('Machinery Furniture Equipment')
+    accumulated_depreciation = balance_sheet.first('Accumulated Depreciation')
+    working_capital = balance_sheet.first('Working Capital')
+    cash = balance_sheet.first('Cash And Cash Equivalents')
+    market_cap = snapshot.info.get('marketCap', None)
+
+    if market_cap is None:
+        raise ValueError("Market capitalization data is unavailable.")
+
+    ev = market_cap + total_debt - cash
+    denom_roc = land_improvements + equipment + properties - abs(accumulated_depreciation) + working_capital
+    return {
+        "EBIT/EV (fixed assets)": ebit / ev if ev > 0 else 0,
+        "ROCE": ebit / denom_roc if denom_roc > 0 else 0,
+    }
+
+
+def magic_formula_ranks(
+    qualified_companies: Sequence[Tuple[str, Optional[float], Optional[float]]]
+) -> Tuple[List[Tuple[int, str, Optional[float]]], List[Tuple[int, str, Optional[float]]], List[Tuple[str, int, int]]]:
+    """
+    Rank (symbol, ebit_to_ev, roic) tuples the same way yfinance_full_magic_formula.py does.
+    Returns the EBIT / EV ranking, the ROIC ranking and the combined ranking (sum of both ranks, lowest first).
+    """
+    # Rank by EBIT / EV (from highest to lowest), ties keep the input order
+    companies = sorted(qualified_companies, key=lambda x: x[1] or -1, reverse=True)
+    ranked_ebit_to_ev = [(rank, symbol, ebit_to_ev) for rank, (symbol, ebit_to_ev, _) in enumerate(companies, 1)]
+
+    # Rank by ROIC (from highest to lowest), ties keep the EBIT / EV order
+    companies.sort(key=lambda x: x[2] or -1, reverse=True)
+    ranked_roic = [(rank, symbol, roic) for rank, (symbol, _, roic) in enumerate(companies, 1)]
+
+    ebit_rankings = {symbol: rank for rank, symbol, _ in ranked_ebit_to_ev}
+    roic_rankings = {symbol: rank for rank, symbol, _ in ranked_roic}
+    combined_ranking = [(symbol, ebit_rankings[symbol], roic_rankings[symbol]) for symbol in ebit_rankings]
+    # Equal sums are broken by the EBIT / EV rank so the order is always the same
+    combined_ranking.sort(key=lambda x: (x[1] + x[2], x[1]))
+
+    return ranked_ebit_to_ev, ranked_roic, combined_ranking
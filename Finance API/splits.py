@@ -1,16 +1,33 @@
 from __future__ import annotations
 
 import os
+import json
 import time
+import threading
 import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
 from typing import Any, Dict, List, Set, Tuple, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from request_governor import TokenBucket
 
 
 FINNHUB_KEY = os.getenv("FINNHUB_API_KEY") or "PUT_YOUR_KEY_HERE"
 BASE = "https://finnhub.io/api/v1"
 
+# Match these to your Finnhub plan (the free tier allows 60 calls per minute)
+CALLS_PER_MINUTE = int(os.getenv("FINNHUB_CALLS_PER_MINUTE", "60"))
+WORKERS = int(os.getenv("FINNHUB_WORKERS", "8"))
+MAX_RETRIES = 5
+
+# Company profiles (exchange and name) barely ever change, so they are kept on disk for a long time.
+# The same file remembers how often each check rejects a symbol and how many calls it costs, for ordering the checks next run.
+CACHE_FILE = os.getenv("FINNHUB_CACHE_FILE") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".finnhub_cache.json")
+PROFILE_TTL = 30 * 24 * 60 * 60  # 30 days
+
 
 # Adjust if you want to be stricter/looser.
 US_EXCH_KEYWORDS = (
@@ -25,14 +42,69 @@ US_EXCH_KEYWORDS = (
 
 SESSION = requests.Session()
 SESSION.headers.update({"Accept": "application/json"})
+# One pooled connection per worker thread
+SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=WORKERS))
+
+# Spreads the calls evenly over the minute, shared by all worker threads
+LIMITER = TokenBucket(rate=CALLS_PER_MINUTE / 60, capacity=1)
+
+# API calls made by the current thread, used to measure what each check costs
+_calls = threading.local()
+
+# After a 429 every thread waits until this time.monotonic() value
+_pause_until = 0.0
+_pause_lock = threading.Lock()
+
+
+def retry_delay(r: requests.Response, attempt: int) -> float:
+    """Seconds to wait after a 429: Retry-After (seconds or an HTTP date), Finnhub's reset time, or exponential backoff."""
+    retry_after = r.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            try:
+                return max((parsedate_to_datetime(retry_after) - dt.datetime.now(dt.timezone.utc)).total_seconds(), 0.0)
+            except (TypeError, ValueError):
+                pass
+    reset = r.headers.get("X-Ratelimit-Reset")
+    if reset:
+        try:
+            return max(float(reset) - time.time(), 0.0) + 0.5
+        except ValueError:
+            pass
+    return float(2 ** attempt)
+
+
+def pause_all(seconds: float) -> None:
+    global _pause_until
+    with _pause_lock:
+        _pause_until = max(_pause_until, time.monotonic() + seconds)
+
+
+def wait_for_pause() -> None:
+    while True:
+        with _pause_lock:
+            remaining = _pause_until - time.monotonic()
+        if remaining <= 0:
+            return
+        time.sleep(remaining)
 
 
 def finnhub_get(path: str, params: Dict[str, Any]) -> Any:
     params = dict(params)
     params["token"] = FINNHUB_KEY
-    r = SESSION.get(f"{BASE}{path}", params=params, timeout=30)
-    r.raise_for_status()
-    return r.json()
+    for attempt in range(MAX_RETRIES + 1):
+        wait_for_pause()
+        LIMITER.acquire()
+        _calls.count = getattr(_calls, "count", 0) + 1
+        r = SESSION.get(f"{BASE}{path}", params=params, timeout=30)
+        if r.status_code == 429 and attempt < MAX_RETRIES:
+            # Over the quota: hold every thread back, not just this one
+            pause_all(retry_delay(r, attempt))
+            continue
+        r.raise_for_status()
+        return r.json()
 
 
 def is_us_exchange(exchange_str: Optional[str]) -> bool:
@@ -71,6 +143,138 @@ def forward_split_events(symbol: str, start: dt.date, end: dt.date) -> List[Dict
     return events
 
 
+class FinnhubCache:
+    """Profiles and check statistics that are kept between runs in CACHE_FILE."""
+
+    def __init__(self, path: str = CACHE_FILE, ttl: float = PROFILE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.profiles: Dict[str, Dict[str, Any]] = data.get("profiles", {})
+        self.check_stats: Dict[str, Dict[str, int]] = data.get("checks", {})
+
+    def has_profile(self, sym: str) -> bool:
+        entry = self.profiles.get(sym)
+        return entry is not None and time.time() - entry.get("fetched", 0) < self.ttl
+
+    def profile(self, sym: str) -> Dict[str, Any]:
+        if self.has_profile(sym):
+            return self.profiles[sym]
+        prof = finnhub_get("/stock/profile2", {"symbol": sym})
+        prof = prof if isinstance(prof, dict) else {}
+        entry = {"fetched": time.time(), "exchange": prof.get("exchange"), "name": prof.get("name")}
+        with self.lock:
+            self.profiles[sym] = entry
+        return entry
+
+    def save(self, checks: List["SymbolCheck"]) -> None:
+        data = {"profiles": self.profiles, "checks": {check.name: check.stats() for check in checks}}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+class SymbolCheck:
+    """
+    One of the per-symbol checks with its measured pass rate and cost (API calls when the answer isn't cached).
+    Checks run in order of expected calls per rejected symbol, cost / (1 - pass rate), which puts cheap checks that reject a lot first.
+    """
+
+    def __init__(self, name: str, run, is_cached=None, stats: Optional[Dict[str, int]] = None):
+        self.name = name
+        self.run = run
+        self.is_cached = is_cached or (lambda sym: False)
+        stats = stats or {}
+        self.runs = stats.get("runs", 0)
+        self.passes = stats.get("passes", 0)
+        self.fetches = stats.get("fetches", 0)
+        self.calls = stats.get("calls", 0)
+
+    def stats(self) -> Dict[str, int]:
+        return {"runs": self.runs, "passes": self.passes, "fetches": self.fetches, "calls": self.calls}
+
+    def rank(self, sym: str) -> float:
+        # The +1/+2 priors make new checks look like they pass half the time and cost one call
+        pass_rate = (self.passes + 1) / (self.runs + 2)
+        cost = 0.0 if self.is_cached(sym) else (self.calls + 1) / (self.fetches + 1)
+        return cost / (1 - pass_rate)
+
+    def record(self, passed: bool, calls: int, cached: bool) -> None:
+        self.runs += 1
+        self.passes += passed
+        if not cached:
+            self.fetches += 1
+            self.calls += calls
+
+
+def make_checks(cache: FinnhubCache, start: dt.date, end: dt.date, price_threshold: float) -> List[SymbolCheck]:
+    """The forward split, US exchange and price checks. Each stores what it fetched in `found` for the result row."""
+
+    def has_forward_split(sym: str, found: Dict[str, Any]) -> bool:
+        found["split_events"] = forward_split_events(sym, start, end)
+        return bool(found["split_events"])
+
+    def is_us_listed(sym: str, found: Dict[str, Any]) -> bool:
+        found["profile"] = cache.profile(sym)
+        return is_us_exchange(found["profile"].get("exchange"))
+
+    def is_above_price(sym: str, found: Dict[str, Any]) -> bool:
+        q = finnhub_get("/quote", {"symbol": sym})
+        try:
+            found["last_price"] = float(q.get("c") if isinstance(q, dict) else None)
+        except (TypeError, ValueError):
+            return False
+        return found["last_price"] > price_threshold
+
+    return [
+        SymbolCheck("split", has_forward_split, stats=cache.check_stats.get("split")),
+        SymbolCheck("exchange", is_us_listed, cache.has_profile, stats=cache.check_stats.get("exchange")),
+        SymbolCheck("price", is_above_price, stats=cache.check_stats.get("price")),
+    ]
+
+
+def check_symbol(sym: str, checks: List[SymbolCheck], lock: threading.Lock) -> Optional[Dict[str, Any]]:
+    """Run the split, exchange and price checks for one symbol, most promising first, stopping at the first one that fails."""
+    with lock:
+        order = sorted(checks, key=lambda check: check.rank(sym))
+
+    found: Dict[str, Any] = {}
+    for check in order:
+        cached = check.is_cached(sym)
+        before = getattr(_calls, "count", 0)
+        try:
+            passed = check.run(sym, found)
+        except requests.HTTPError:
+            passed = False
+        with lock:
+            check.record(passed, getattr(_calls, "count", 0) - before, cached)
+        if not passed:
+            return None
+
+    # Keep the most relevant split event (earliest date in window)
+    # Finnhub split event often has 'date' (YYYY-MM-DD)
+    split_events_sorted = sorted(
+        found["split_events"], key=lambda ev: (ev.get("date") or "9999-12-31")
+    )
+    ev0 = split_events_sorted[0]
+
+    return {
+        "symbol": sym,
+        "company": found["profile"].get("name"),
+        "exchange": found["profile"].get("exchange"),
+        "last_price": found["last_price"],
+        "split_date": ev0.get("date"),
+        "fromFactor": ev0.get("fromFactor"),
+        "toFactor": ev0.get("toFactor"),
+    }
+
+
 def main(days_ahead: int = 10, price_threshold: float = 1000.0) -> List[Dict[str, Any]]:
     if not FINNHUB_KEY or FINNHUB_KEY == "PUT_YOUR_KEY_HERE":
         raise RuntimeError("Set FINNHUB_API_KEY env var or put your key in FINNHUB_KEY.")
@@ -84,65 +288,16 @@ def main(days_ahead: int = 10, price_threshold: float = 1000.0) -> List[Dict[str
     symbols: Set[str] = {row.get("symbol") for row in earnings if row.get("symbol")}
     symbols = {s.strip().upper() for s in symbols if s and isinstance(s, str)}
 
-    results: List[Dict[str, Any]] = []
-
-    for i, sym in enumerate(sorted(symbols)):
-        # crude rate limiting (free tier is limited; tune as needed)
-        if i and i % 25 == 0:
-            time.sleep(1.2)
-
-        # 2) Check for forward split in the same date window
-        try:
-            split_events = forward_split_events(sym, start, end)
-        except requests.HTTPError:
-            continue
+    cache = FinnhubCache()
+    checks = make_checks(cache, start, end, price_threshold)
+    lock = threading.Lock()
 
-        if not split_events:
-            continue
-
-        # 3) Check US exchange
-        try:
-            prof = finnhub_get("/stock/profile2", {"symbol": sym})
-        except requests.HTTPError:
-            continue
-
-        exchange = prof.get("exchange") if isinstance(prof, dict) else None
-        if not is_us_exchange(exchange):
-            continue
-
-        # 4) Check current price
-        try:
-            q = finnhub_get("/quote", {"symbol": sym})
-        except requests.HTTPError:
-            continue
-
-        last_price = q.get("c") if isinstance(q, dict) else None
-        try:
-            last_price = float(last_price)
-        except (TypeError, ValueError):
-            continue
-
-        if last_price <= price_threshold:
-            continue
+    # 2-4) Check the symbols concurrently, the shared limiter keeps the calls within the plan's quota
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        checked = pool.map(lambda sym: check_symbol(sym, checks, lock), sorted(symbols))
+        results: List[Dict[str, Any]] = [row for row in checked if row is not None]
 
-        # Keep the most relevant split event (earliest date in window)
-        # Finnhub split event often has 'date' (YYYY-MM-DD)
-        split_events_sorted = sorted(
-            split_events, key=lambda ev: (ev.get("date") or "9999-12-31")
-        )
-        ev0 = split_events_sorted[0]
-
-        results.append(
-            {
-                "symbol": sym,
-                "company": prof.get("name"),
-                "exchange": exchange,
-                "last_price": last_price,
-                "split_date": ev0.get("date"),
-                "fromFactor": ev0.get("fromFactor"),
-                "toFactor": ev0.get("toFactor"),
-            }
-        )
+    cache.save(checks)
 
     return results
 
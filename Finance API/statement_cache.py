@@ -0,0 +1,185 @@
+# Shared on-disk cache for the yfinance data the Finance API screeners download.
+# Annual statements only change once a year, so they are kept for a long time, while `info` (prices, market cap, P/B) expires quickly.
+# Every entry is a compressed pickle stored under YF_CACHE_DIR (by default a .yf_cache folder next to this file).
+
+from __future__ import annotations
+
+import gzip
+import os
+import pickle
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import yfinance as yf
+
+from request_governor import GOVERNOR
+from run_metrics import METRICS
+
+# Set YF_OFFLINE=1 to never touch the network: anything not in the cache is served from the local fundamentals store (fundamentals_store.py)
+OFFLINE = os.getenv("YF_OFFLINE") == "1"
+
+CACHE_DIR = os.getenv("YF_CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".yf_cache")
+
+# How long each kind of data stays fresh, in seconds
+STATEMENT_TTL = 30 * 24 * 60 * 60  # 30 days
+QUARTERLY_TTL = 7 * 24 * 60 * 60  # 7 days, a new quarter should show up soon after it is reported
+INFO_TTL = 12 * 60 * 60  # 12 hours
+
+STATEMENT_KINDS = ("financials", "balance_sheet", "cashflow")
+QUARTERLY_KINDS = ("quarterly_financials", "quarterly_balance_sheet", "quarterly_cashflow")
+TTLS = {
+    "info": INFO_TTL,
+    **{kind: STATEMENT_TTL for kind in STATEMENT_KINDS},
+    **{kind: QUARTERLY_TTL for kind in QUARTERLY_KINDS},
+}
+
+
+def cache_path(ticker: str, kind: str) -> str:
+    return os.path.join(CACHE_DIR, kind, f"{ticker.upper()}.pkl.gz")
+
+
+def load(ticker: str, kind: str, ttl: Optional[float] = None) -> Any:
+    """Return the cached value for (ticker, kind), or None if it is missing or older than its TTL."""
+    path = cache_path(ticker, kind)
+    ttl = TTLS[kind] if ttl is None else ttl
+    start = time.perf_counter()
+    value, size = None, 0
+    try:
+        if time.time() - os.path.getmtime(path) <= ttl:
+            with gzip.open(path, "rb") as f:
+                value = pickle.load(f)
+            size = os.path.getsize(path)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        value = None
+    METRICS.record("cache", ticker=ticker, kind=kind, hit=value is not None, seconds=round(time.perf_counter() - start, 6), bytes=size)
+    return value
+
+
+def save(ticker: str, kind: str, value: Any) -> int:
+    """Store the value and return its size in bytes before compression."""
+    path = cache_path(ticker, kind)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    # Write to a temporary file first so a crash (or another thread) never leaves a half written entry behind
+    # Threads share the PID, so the name needs the thread too
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def download(ticker: str, kind: str, stock: Optional[yf.Ticker] = None) -> Any:
+    """Ask Yahoo for `stock.<kind>` and store the result in the cache."""
+    stock = stock or yf.Ticker(ticker)
+    attempts = 0
+
+    def request():
+        nonlocal attempts
+        attempts += 1
+        return getattr(stock, kind)
+
+    start = time.perf_counter()
+    size, error = 0, None
+    try:
+        # Rate limited and retried on throttling by the shared request governor
+        value = GOVERNOR.call(request)
+        # Don't cache empty results, they are usually a failed or throttled request
+        if value is not None and len(value) > 0:
+            size = save(ticker, kind, value)
+        return value
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        # yfinance doesn't expose the response sizes, the pickled result stands in for the bytes transferred
+        METRICS.record(
+            "download", ticker=ticker, kind=kind, seconds=round(time.perf_counter() - start, 6),
+            bytes=size, retries=max(attempts - 1, 0), error=error,
+        )
+
+
+def fetch(ticker: str, kind: str, stock: Optional[yf.Ticker] = None) -> Any:
+    """
+    Return `stock.<kind>` for the ticker, using the disk cache when it is still fresh.
+    kind is 'info', one of the annual statements ('financials', 'balance_sheet', 'cashflow') or their 'quarterly_' versions.
+    """
+    if kind not in TTLS:
+        raise ValueError(f"Unknown statement type: {kind}")
+
+    value = load(ticker, kind)
+    if value is None:
+        value = download(ticker, kind, stock)
+    return value
+
+
+def fetch_info(ticker: str, stock: Optional[yf.Ticker] = None) -> dict:
+    return fetch(ticker, "info", stock)
+
+
+def fetch_statement(ticker: str, kind: str, stock: Optional[yf.Ticker] = None):
+    if kind not in STATEMENT_KINDS + QUARTERLY_KINDS:
+        raise ValueError(f"Unknown statement type: {kind}")
+    return fetch(ticker, kind, stock)
+
+
+class CachedTicker:
+    """
+    Drop-in replacement for yf.Ticker in the screeners: `info`, `financials`, `balance_sheet` and `cashflow`
+    are read through the disk cache, and Yahoo is only asked when the cached copy is missing or expired.
+    Like yf.Ticker, each value is fetched once per instance, so reading a statement again (even an empty one) costs nothing.
+    """
+
+    def __init__(self, ticker: str):
+        self.ticker = ticker
+        self._stock: Optional[yf.Ticker] = None
+        self._values: Dict[str, Any] = {}
+
+    def _fetch(self, kind: str) -> Any:
+        if kind not in self._values:
+            self._values[kind] = self._load(kind)
+        return self._values[kind]
+
+    def _load(self, kind: str) -> Any:
+        value = load(self.ticker, kind)
+        if value is None and OFFLINE:
+            from fundamentals_store import StoredTicker
+
+            if self._stock is None:
+                self._stock = StoredTicker(self.ticker)
+            value = getattr(self._stock, kind)
+        elif value is None:
+            # Only build the real yf.Ticker when something actually has to be downloaded
+            if self._stock is None:
+                self._stock = yf.Ticker(self.ticker)
+            value = download(self.ticker, kind, self._stock)
+        return value
+
+    @property
+    def info(self) -> dict:
+        return self._fetch("info")
+
+    @property
+    def financials(self):
+        return self._fetch("financials")
+
+    @property
+    def balance_sheet(self):
+        return self._fetch("balance_sheet")
+
+    @property
+    def cashflow(self):
+        return self._fetch("cashflow")
+
+    @property
+    def quarterly_financials(self):
+        return self._fetch("quarterly_financials")
+
+    @property
+    def quarterly_balance_sheet(self):
+        return self._fetch("quarterly_balance_sheet")
+
+    @property
+    def quarterly_cashflow(self):
+        return self._fetch("quarterly_cashflow")
@@ -0,0 +1,64 @@
+# One object per ticker that holds its info and statements, so a screen downloads (or reads from the cache) each of them exactly once.
+# The same snapshot is handed from the prefilter to the scoring step instead of building a new yf.Ticker for every pass.
+
+from __future__ import annotations
+
+from functools import cached_property
+
+from statement_cache import CachedTicker
+
+
+class TickerSnapshot:
+    """
+    `info`, `financials`, `balance_sheet` and `cashflow` are fetched the first time they are used
+    and then kept in memory, so repeated reads inside the scoring code cost nothing.
+    """
+
+    def __init__(self, ticker: str):
+        self.ticker = ticker
+        self._source = CachedTicker(ticker)
+
+    @cached_property
+    def info(self) -> dict:
+        return self._source.info or {}
+
+    @cached_property
+    def financials(self):
+        return self._source.financials
+
+    @cached_property
+    def balance_sheet(self):
+        return self._source.balance_sheet
+
+    @cached_property
+    def cashflow(self):
+        return self._source.cashflow
+
+    @cached_property
+    def quarterly_financials(self):
+        return self._source.quarterly_financials
+
+    @cached_property
+    def quarterly_balance_sheet(self):
+        return self._source.quarterly_balance_sheet
+
+    @cached_property
+    def quarterly_cashflow(self):
+        return self._source.quarterly_cashflow
+
+    def prefetch(self) -> "TickerSnapshot":
+        """Load the three statements right away (useful inside a worker thread so the requests overlap)."""
+        self.financials
+        self.balance_sheet
+        self.cashflow
+        return self
+
+    def prefetch_quarterly(self) -> "TickerSnapshot":
+        """Same as prefetch() for the quarterly statements."""
+        self.quarterly_financials
+        self.quarterly_balance_sheet
+        self.quarterly_cashflow
+        return self
+
+    def __repr__(self) -> str:
+        return f"TickerSnapshot({self.ticker!r})"
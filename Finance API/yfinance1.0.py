@@ -1,4 +1,5 @@
-import yfinance as yf
+from statement_cache import CachedTicker
+from concurrent_fetch import map_tickers
 
 # Define the list of ticker symbols
 prefilter = [
@@ -28,30 +29,19 @@ prefilter = [
     "NFG", "PCG", "SJW", "SO", "SRE", "UGI"
 ]
 
-# Create a list to store tickers with P/B < 1
-tickers = []
+# Look up the P/B ratio of a single ticker
+def get_pb_ratio(ticker):
+    stock = CachedTicker(ticker)
+    return stock.info.get('priceToBook', None)
 
-# Fetch data for each ticker and check the P/B ratio
-for ticker in prefilter:
-    try:
-        stock = yf.Ticker(ticker)
-        pb_ratio = stock.info.get('priceToBook', None)
-        if pb_ratio is not None and pb_ratio < 1:
-            tickers.append(ticker)
-    except Exception as e:
-        print(f"Error processing {ticker}: {e}")
-        #
-        #
-        #
-        #
-        #
-# Dictionary to store results
-results = {}
-
-# Loop through each ticker symbol
-for ticker in tickers:
+# Fetch the P/B ratios of every ticker concurrently and keep the ones with P/B < 1 (in the original order)
+pb_ratios = map_tickers(get_pb_ratio, prefilter)
+tickers = [ticker for ticker, pb_ratio in pb_ratios.items() if pb_ratio is not None and pb_ratio < 1]
+
+# Calculate the F-Score of a single ticker
+def calculate_f_score(ticker):
     # Download the stock's information
-    stock = yf.Ticker(ticker)
+    stock = CachedTicker(ticker)
     score = 0  # Initialize the score for each company
 
     try:
@@ -173,9 +163,12 @@ for ticker in tickers:
     except (KeyError, IndexError, TypeError):
         pass  # Skip if data is unavailable
     
-    # Store the final score in results
-    results[ticker] = score if score > 0 else "Data unavailable"
-    
+    # Return the final score
+    return score if score > 0 else "Data unavailable"
+
+# Score every ticker concurrently, the results keep the same order as tickers
+results = map_tickers(calculate_f_score, tickers)
+
 # Split companies by score groups
 score_groups = {}
 
@@ -185,8 +178,8 @@ for ticker, score in results.items():
         score_groups[score] = []
     score_groups[score].append(ticker)
 
-# Sort the score groups by score (from highest to lowest)
-sorted_score_groups = sorted(score_groups.items(), key=lambda x: x[0], reverse=True)
+# Sort the score groups by score (from highest to lowest), "Data unavailable" last
+sorted_score_groups = sorted(score_groups.items(), key=lambda x: x[0] if isinstance(x[0], int) else -1, reverse=True)
 
 # Display the sorted groups
 for score, tickers in sorted_score_groups:
@@ -1,4 +1,7 @@
-import yfinance as yf
+from concurrent_fetch import map_tickers
+from run_metrics import METRICS
+from screens import MAGIC_FORMULA_FILTERS, FilterStats
+from statement_cache import CachedTicker
 
 # List of company ticker symbols
 tickers = [
@@ -22,38 +25,41 @@ tickers = [
 # New list to store companies that pass filters
 qualified_companies = []
 
-# List of sectors to exclude
-excluded_sectors = ["Financial Services", "Utilities"]
+# Cheap profile checks first: every `info` is fetched (or read from the cache) up front, and statements are only
+# requested for the companies that pass the sector, market cap, country and ADR filters
+METRICS.start("combined_fs_and_mf")
+filter_stats = FilterStats(MAGIC_FORMULA_FILTERS)
+with METRICS.stage("profiles"):
+    infos = map_tickers(lambda ticker: CachedTicker(ticker).info, tickers, stage="info")
+    candidates = filter_stats.select(infos)
+filter_stats.print_report()
 
-# Loop through each ticker in the tickers list
-for ticker in tickers:
-    stock = yf.Ticker(ticker)
+# Loop through each company that passed the filters
+for ticker in candidates:
+    stock = CachedTicker(ticker)
     try:
         # Extract necessary data
-        market_cap = stock.info.get('marketCap', 0)
-        sector = stock.info.get('sector', '')
-        country = stock.info.get('country', '')
-        symbol = stock.info.get('symbol', '')
+        market_cap = infos[ticker].get('marketCap', 0)
+        symbol = infos[ticker].get('symbol', '')
 
-        # Check if the company meets all conditions
-        if market_cap > 100_000_000 and sector not in excluded_sectors and country == "United States" and "ADR" not in symbol:
-            # Extract financial data
-            ebit = stock.financials.loc['EBIT', :].dropna().iloc[0]
-            total_debt = stock.balance_sheet.loc['Total Debt', :].fillna(0).iloc[0]
-            cash = stock.balance_sheet.loc['Cash And Cash Equivalents', :].fillna(0).iloc[0]
-            shareholders_equity = stock.balance_sheet.loc['Stockholders Equity', :].fillna(0).iloc[0]
+        # Extract financial data
+        ebit = stock.financials.loc['EBIT', :].dropna().iloc[0]
+        total_debt = stock.balance_sheet.loc['Total Debt', :].fillna(0).iloc[0]
+        cash = stock.balance_sheet.loc['Cash And Cash Equivalents', :].fillna(0).iloc[0]
+        shareholders_equity = stock.balance_sheet.loc['Stockholders Equity', :].fillna(0).iloc[0]
 
-            # Calculate Enterprise Value
-            enterprise_value = market_cap + total_debt - cash
-            invested_capital = total_debt + shareholders_equity - cash
+        # Calculate Enterprise Value
+        enterprise_value = market_cap + total_debt - cash
+        invested_capital = total_debt + shareholders_equity - cash
 
-            ebit_to_ev = round(ebit / enterprise_value, 4) if enterprise_value > 0 else None
-            roic = round(ebit / invested_capital, 3) if invested_capital > 0 else None
+        ebit_to_ev = round(ebit / enterprise_value, 4) if enterprise_value > 0 else None
+        roic = round(ebit / invested_capital, 3) if invested_capital > 0 else None
 
-            # Add to qualified companies list
-            qualified_companies.append((symbol, ebit_to_ev, roic))
+        # Add to qualified companies list
+        qualified_companies.append((symbol, ebit_to_ev, roic))
     except Exception as e:
         print(f"Error processing {ticker}: {e}")
+        METRICS.record("failed", stage="statements", ticker=ticker, error=type(e).__name__)
 
 # Rank by EBIT / EV (from highest to lowest)
 qualified_companies.sort(key=lambda x: x[1] or -1, reverse=True)
@@ -85,3 +91,5 @@ print("\n--- Top 5 Combined Rankings (Based on Sum of Ranks) ---")
 for symbol, ebit_rank, roic_rank in combined_ranking[:5]:
     combined_rank = ebit_rank + roic_rank
     print(f"{symbol}: Combined Rank = {combined_rank} (EBIT / EV Rank = {ebit_rank}, ROIC Rank = {roic_rank})")
+
+METRICS.finish()
@@ -1,4 +1,6 @@
-import yfinance as yf
+from line_items import line_item_index
+from screens import FIXED_ASSETS_ITEMS
+from statement_cache import CachedTicker
 
 print("Magic Formula Calculator (type 'exit' to end and list companies.)\n")
 
@@ -24,22 +26,31 @@ while True:
 
     # Analyze the single ticker
     ticker = user_input
-    stock = yf.Ticker(ticker)
+    stock = CachedTicker(ticker)
 
     try:
+        # Resolve every line item once and name all the missing ones instead of stopping at the first
+        financials = line_item_index(stock.financials)
+        balance_sheet = line_item_index(stock.balance_sheet)
+        financials.require('EBIT')
+        balance_sheet.require(*FIXED_ASSETS_ITEMS, 'Total Assets', 'Current Liabilities')
+
         # Get the relevant financial data
-        ebit = stock.financials.loc['EBIT', :].dropna().iloc[0]
-        total_debt = stock.balance_sheet.loc['Total Debt', :].fillna(0).iloc[0]
-        land_improvements = stock.balance_sheet.loc['Land And Improvements'].fillna(0).iloc[0]
-        properties = stock.balance_sheet.loc['Properties'].fillna(0).iloc[0]
-        equipment = stock.balance_sheet.loc['Machinery Furniture Equipment'].fillna(0).iloc[0]
-        accumulated_depreciation = stock.balance_sheet.loc['Accumulated Depreciation'].fillna(0).iloc[0]
+        ebit = financials.latest('EBIT')
+        total_debt = balance_sheet.first('Total Debt')
+        land_improvements = balance_sheet.first('Land And Improvements')
+        properties = balance_sheet.first('Properties')
+        equipment = balance_sheet.first('Machinery Furniture Equipment')
+        accumulated_depreciation = balance_sheet.first('Accumulated Depreciation')
         abs_accumulated_depreciation = abs(accumulated_depreciation)
-        working_capital = stock.balance_sheet.loc['Working Capital'].fillna(0).iloc[0]
-        cash = stock.balance_sheet.loc['Cash And Cash Equivalents', :].fillna(0).iloc[0]
+        working_capital = balance_sheet.first('Working Capital')
+        cash = balance_sheet.first('Cash And Cash Equivalents')
         market_cap = stock.info.get('marketCap', None)
-        total_assets = stock.balance_sheet.loc['Total Assets', :].dropna().iloc[0]
-        current_liabilities = stock.balance_sheet.loc['Current Liabilities', :].dropna().iloc[0]
+        total_assets = balance_sheet.latest('Total Assets')
+        current_liabilities = balance_sheet.latest('Current Liabilities')
+
+        if ebit is None or total_assets is None or current_liabilities is None:
+            raise ValueError("EBIT, total assets or current liabilities has no values.")
 
         if market_cap is None:
             raise ValueError("Market capitalization data is unavailable.")
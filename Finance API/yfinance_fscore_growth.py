@@ -1,18 +1,30 @@
-import yfinance as yf
+from fscore_panel import GROWTH_ITEMS
+from line_items import line_item_index, missing_line_items
+from statement_cache import CachedTicker
+
+
+def latest_two(series):
+    """The two most recent non-NaN values of a per-year series, or None if there aren't two."""
+    series = series.dropna().sort_index(ascending=False)
+    return (series.iloc[0], series.iloc[1]) if len(series) >= 2 else None
+
 
 def calculate_growth_f_score(ticker):
-    stock = yf.Ticker(ticker)
+    stock = CachedTicker(ticker)
+    # Every line item is resolved once per statement, a missing one just skips the signals that need it
+    financials = line_item_index(stock.financials)
+    balance_sheet = line_item_index(stock.balance_sheet)
+    cashflow = line_item_index(stock.cashflow)
+    missing = missing_line_items(stock, GROWTH_ITEMS)
     score = 0  # Initialize the score for each company
 
-    try:
-        # ROA and CFO Calculations
-        roa = stock.financials.loc['Net Income'] / stock.balance_sheet.loc['Total Assets']
-        roa = roa.dropna().sort_index(ascending=False)
-        cfo = stock.cashflow.loc['Operating Cash Flow'].dropna().iloc[0]  # Most recent non-null CFO
+    # ROA and CFO Calculations
+    if financials.has('Net Income') and balance_sheet.has('Total Assets') and cashflow.has('Operating Cash Flow'):
+        roa = latest_two(financials.series('Net Income') / balance_sheet.series('Total Assets'))
+        cfo = cashflow.latest('Operating Cash Flow')  # Most recent non-null CFO
 
-        if len(roa) >= 2:
-            current_roa = roa.iloc[0]  # Most recent ROA
-            previous_roa = roa.iloc[1]  # ROA from the previous year
+        if roa is not None and cfo is not None:
+            current_roa, previous_roa = roa  # Most recent ROA and the one from the previous year
 
             if current_roa > 0:
                 score += 1  # Positive current ROA
@@ -23,85 +35,49 @@ def calculate_growth_f_score(ticker):
             if cfo > current_roa:
                 score += 1  # CFO > ROA
 
-    except (KeyError, IndexError, TypeError):
-        pass
-
-    try:
-        # Current Ratio Check
-        current_ratio = stock.balance_sheet.loc['Total Current Assets'] / stock.balance_sheet.loc['Total Current Liabilities']
-        current_ratio = current_ratio.dropna().sort_index(ascending=False)
-
-        if len(current_ratio) >= 2:
-            current_current_ratio = current_ratio.iloc[0]
-            previous_current_ratio = current_ratio.iloc[1]
-
-            if current_current_ratio > previous_current_ratio:
-                score += 1  # Improving Current Ratio
-
-    except (KeyError, IndexError, TypeError):
-        pass
+    # Current Ratio Check
+    if balance_sheet.has('Current Assets', 'Current Liabilities'):
+        current_ratio = latest_two(balance_sheet.series('Current Assets') / balance_sheet.series('Current Liabilities'))
 
-    try:
-        # Long-Term Debt to Total Assets Ratio
-        long_term_debt = stock.balance_sheet.loc['Long Term Debt']
-        total_assets = stock.balance_sheet.loc['Total Assets']
-        long_term_debt_to_assets = (long_term_debt / total_assets).dropna().sort_index(ascending=False)
+        if current_ratio is not None and current_ratio[0] > current_ratio[1]:
+            score += 1  # Improving Current Ratio
 
-        if len(long_term_debt_to_assets) >= 2:
-            if long_term_debt_to_assets.iloc[0] < long_term_debt_to_assets.iloc[1]:
-                score += 1  # Improving Debt-to-Assets Ratio
+    # Long-Term Debt to Total Assets Ratio
+    if balance_sheet.has('Long Term Debt', 'Total Assets'):
+        long_term_debt_to_assets = latest_two(balance_sheet.series('Long Term Debt') / balance_sheet.series('Total Assets'))
 
-    except (KeyError, IndexError, TypeError):
-        pass
+        if long_term_debt_to_assets is not None and long_term_debt_to_assets[0] < long_term_debt_to_assets[1]:
+            score += 1  # Improving Debt-to-Assets Ratio
 
-    try:
-        # Shares Outstanding
-        shares_outstanding = stock.balance_sheet.loc['Ordinary Shares Number']
-        shares_outstanding = shares_outstanding.dropna().sort_index(ascending=False)
+    # Shares Outstanding
+    if balance_sheet.has('Ordinary Shares Number'):
+        shares_outstanding = latest_two(balance_sheet.series('Ordinary Shares Number'))
 
-        if len(shares_outstanding) >= 2:
-            if shares_outstanding.iloc[0] <= shares_outstanding.iloc[1]:
-                score += 1  # Same or fewer shares outstanding
+        if shares_outstanding is not None and shares_outstanding[0] <= shares_outstanding[1]:
+            score += 1  # Same or fewer shares outstanding
 
-    except (KeyError, IndexError, TypeError):
-        pass
+    # Gross Margin Ratio
+    if financials.has('Gross Profit', 'Total Revenue'):
+        gross_margin = latest_two(financials.series('Gross Profit') / financials.series('Total Revenue'))
 
-    try:
-        # Gross Margin Ratio
-        gross_profit = stock.financials.loc['Gross Profit']
-        total_revenue = stock.financials.loc['Total Revenue']
-        gross_margin = (gross_profit / total_revenue).dropna().sort_index(ascending=False)
+        if gross_margin is not None and gross_margin[0] > gross_margin[1]:
+            score += 1  # Improving Gross Margin Ratio
 
-        if len(gross_margin) >= 2:
-            if gross_margin.iloc[0] > gross_margin.iloc[1]:
-                score += 1  # Improving Gross Margin Ratio
+    # Asset Turnover Ratio
+    if financials.has('Total Revenue') and balance_sheet.has('Total Assets'):
+        asset_turnover = latest_two(financials.series('Total Revenue') / balance_sheet.series('Total Assets'))
 
-    except (KeyError, IndexError, TypeError):
-        pass
-
-    try:
-        # Asset Turnover Ratio
-        asset_turnover = (stock.financials.loc['Total Revenue'] / stock.balance_sheet.loc['Total Assets']).dropna().sort_index(ascending=False)
-
-        if len(asset_turnover) >= 2:
-            if asset_turnover.iloc[0] > asset_turnover.iloc[1]:
-                score += 1  # Improving Asset Turnover Ratio
-
-    except (KeyError, IndexError, TypeError):
-        pass
-
-    try:
-        # Revenue Increase Check
-        total_revenue = stock.financials.loc['Total Revenue'].dropna().sort_index(ascending=False)
+        if asset_turnover is not None and asset_turnover[0] > asset_turnover[1]:
+            score += 1  # Improving Asset Turnover Ratio
 
-        if len(total_revenue) >= 2:
-            if total_revenue.iloc[0] > total_revenue.iloc[1]:
-                score += 1  # Revenue increased year over year
+    # Revenue Increase Check
+    if financials.has('Total Revenue'):
+        total_revenue = latest_two(financials.series('Total Revenue'))
 
-    except (KeyError, IndexError, TypeError):
-        pass
+        if total_revenue is not None and total_revenue[0] > total_revenue[1]:
+            score += 1  # Revenue increased year over year
 
-    return score
+    return score, missing
 
 
 # Continuous Input Loop
@@ -116,7 +92,9 @@ while True:
         continue
     
     try:
-        growth_f_score = calculate_growth_f_score(ticker)
+        growth_f_score, missing = calculate_growth_f_score(ticker)
         print(f"{ticker} Growth-Adjusted F-Score: {growth_f_score}/10")
+        for kind, names in missing.items():
+            print(f"  not in {kind}: {', '.join(names)}")
     except Exception as e:
         print(f"Error processing {ticker}: {e}")
@@ -1,6 +1,19 @@
 # This program uses the yfinance api to get stock market data and then applies the Piotroski F-Score to evaluate each company which has a price to book ratio above 1.
 
-import yfinance as yf
+import os
+
+from ticker_snapshot import TickerSnapshot
+from line_items import line_item_index
+from fscore_panel import StatementPanel, f_scores, ttm_f_scores
+from fundamentals_store import QUARTERLY_ITEMS, QUARTERLY_STORE_DIR, FundamentalsStore
+from concurrent_fetch import run_pipeline
+from run_metrics import METRICS
+
+# Set FSCORE_ENGINE=panel to score the whole universe at once with the vectorized engine in fscore_panel.py,
+# or FSCORE_ENGINE=ttm to score trailing twelve month figures from the quarterly statements with the same engine
+ENGINE = os.getenv("FSCORE_ENGINE", "loop")
+
+METRICS.start(f"full_fscore_{ENGINE}")
 
 # Define the list of ticker symbols
 prefilter = [
@@ -50,40 +63,30 @@ prefilter = [
     "YUM", "ZBH", "ZBRA", "ZTS"
 ]
 
-# Create a list to store tickers with P/B < 1
-tickers = []
-
-# Fetch data for each ticker and check the P/B ratio
-for ticker in prefilter:
-    try:
-        stock = yf.Ticker(ticker)
-        pb_ratio = stock.info.get('priceToBook', None)
-        if pb_ratio is not None and pb_ratio < 1:
-            tickers.append(ticker)
-    except Exception as e:
-        print(f"Error processing {ticker}: {e}")
-        #
-        #
-        #
-        #
-        #
-# Dictionary to store results
-results = {}
-
-# Loop through each ticker symbol
-for ticker in tickers:
-    # Download the stock's information
-    stock = yf.Ticker(ticker)
+# Check the P/B ratio of a single ticker and return its snapshot if P/B < 1, the scoring stage reuses it so nothing is fetched twice
+def prefilter_ticker(ticker):
+    snapshot = TickerSnapshot(ticker)
+    pb_ratio = snapshot.info.get('priceToBook', None)
+    if pb_ratio is not None and pb_ratio < 1:
+        return snapshot
+    return None
+
+# Calculate the F-Score of a single ticker
+def calculate_f_score(snapshot):
+    # Index each statement once, all nine signals read their line items by position and skip the ones that are missing
+    financials = line_item_index(snapshot.financials)
+    balance_sheet = line_item_index(snapshot.balance_sheet)
+    cashflow = line_item_index(snapshot.cashflow)
     score = 0  # Initialize the score for each company
 
-    try:
+    if financials.has('Net Income') and balance_sheet.has('Total Assets') and cashflow.has('Operating Cash Flow'):
         # Calculate ROA for the last two years and current operating cash flow
-        roa = stock.financials.loc['Net Income'] / stock.balance_sheet.loc['Total Assets']
+        roa = financials.series('Net Income') / balance_sheet.series('Total Assets')
         roa = roa.dropna()  # Remove any null values to avoid errors
         roa =  roa.sort_index(ascending=False)
-        cfo = stock.cashflow.loc['Operating Cash Flow'].dropna().iloc[0]  # Most recent non-null CFO
+        cfo = cashflow.latest('Operating Cash Flow')  # Most recent non-null CFO
 
-        if len(roa) >= 2:
+        if len(roa) >= 2 and cfo is not None:
             current_roa = roa.iloc[0]  # Most recent ROA
             previous_roa = roa.iloc[1]  # ROA from the previous year
 
@@ -102,12 +105,9 @@ for ticker in tickers:
             if cfo > current_roa:
                 score += 1
 
-    except (KeyError, IndexError, TypeError):
-        pass  # Skip if data is unavailable
-
-    try:
+    if balance_sheet.has('Current Assets', 'Current Liabilities'):
         # Calculate the current ratio for the last two years
-        current_ratio = stock.balance_sheet.loc['Current Assets'] / stock.balance_sheet.loc['Current Liabilities']
+        current_ratio = balance_sheet.series('Current Assets') / balance_sheet.series('Current Liabilities')
         current_ratio = current_ratio.dropna()
         current_ratio =  current_ratio.sort_index(ascending=False)
 
@@ -119,13 +119,10 @@ for ticker in tickers:
             if current_current_ratio > previous_current_ratio:
                 score += 1  # Award a point for improvement in current ratio
 
-    except (KeyError, IndexError, TypeError):
-        pass  # Skip if data is unavailable
-
-    try:
+    if balance_sheet.has('Long Term Debt', 'Total Assets'):
         # Calculate the long-term debt to total assets ratio for the last two years
-        long_term_debt = stock.balance_sheet.loc['Long Term Debt']
-        total_assets = stock.balance_sheet.loc['Total Assets']
+        long_term_debt = balance_sheet.series('Long Term Debt')
+        total_assets = balance_sheet.series('Total Assets')
         long_term_debt_to_assets = long_term_debt / total_assets
         long_term_debt_to_assets = long_term_debt_to_assets.dropna()
         long_term_debt_to_assets =  long_term_debt_to_assets.sort_index(ascending=False)
@@ -138,12 +135,9 @@ for ticker in tickers:
             if current_long_term_debt_to_assets < previous_long_term_debt_to_assets:
                 score += 1  # Award a point for improvement in the debt-to-assets ratio
 
-    except (KeyError, IndexError, TypeError):
-        pass  # Skip if data is unavailable
-
-    try:
+    if balance_sheet.has('Ordinary Shares Number'):
         # Get the number of shares outstanding for the last two years
-        shares_outstanding = stock.balance_sheet.loc['Ordinary Shares Number']
+        shares_outstanding = balance_sheet.series('Ordinary Shares Number')
         shares_outstanding = shares_outstanding.dropna()
         shares_outstanding = shares_outstanding.sort_index(ascending=False)
 
@@ -155,13 +149,10 @@ for ticker in tickers:
             if current_shares <= previous_shares:
                 score += 1  # Award a point if shares are the same or fewer
 
-    except (KeyError, IndexError, TypeError):
-        pass  # Skip if data is unavailable
-
-    try:
+    if financials.has('Gross Profit', 'Total Revenue'):
         # Calculate the gross margin ratio for the last two years
-        gross_profit = stock.financials.loc['Gross Profit']
-        total_revenue = stock.financials.loc['Total Revenue']
+        gross_profit = financials.series('Gross Profit')
+        total_revenue = financials.series('Total Revenue')
         gross_profit = gross_profit.dropna()
         total_revenue = total_revenue.dropna()
         gross_margin = gross_profit / total_revenue
@@ -175,14 +166,12 @@ for ticker in tickers:
             # Check if current year's gross margin ratio is higher than the previous year's
             if current_gross_margin > previous_gross_margin:
                 score += 1  # Award a point for improvement in gross margin ratio
-    except (KeyError, IndexError, TypeError):
-        pass  # Skip if data is unavailable
     
-    try:
+    if financials.has('Total Revenue') and balance_sheet.has('Total Assets'):
         # Calculate the asset turnover ratio for the last two years
-        total_revenue = stock.financials.loc['Total Revenue']
-        total_assets = stock.balance_sheet.loc['Total Assets']
-        asset_turnover = stock.financials.loc['Total Revenue'] / stock.balance_sheet.loc['Total Assets']
+        total_revenue = financials.series('Total Revenue')
+        total_assets = balance_sheet.series('Total Assets')
+        asset_turnover = total_revenue / total_assets
         asset_turnover = asset_turnover.dropna()
         asset_turnover =  asset_turnover.sort_index(ascending=False)
         if len(asset_turnover) >= 2:
@@ -192,12 +181,35 @@ for ticker in tickers:
             if current_asset_turnover > previous_asset_turnover:
                 score += 1  # Award a point for improvement in asset turnover ratio
 
-    except (KeyError, IndexError, TypeError):
-        pass  # Skip if data is unavailable
-    
-    # Store the final score in results
-    results[ticker] = score if score > 0 else "Data unavailable"
-    
+    # Return the final score
+    return score if score > 0 else "Data unavailable"
+
+if ENGINE == "panel":
+    # Tickers that pass the P/B check have their statements downloaded right away while the check keeps running,
+    # then every ticker is scored in one vectorized pass
+    with METRICS.stage("fetch"):
+        snapshots = run_pipeline(prefilter, prefilter_ticker, TickerSnapshot.prefetch)
+    with METRICS.stage("score"):
+        scores = f_scores(StatementPanel.from_statements(snapshots))["F-Score"]
+    results = {ticker: int(score) if score > 0 else "Data unavailable" for ticker, score in scores.items()}
+elif ENGINE == "ttm":
+    with METRICS.stage("fetch"):
+        snapshots = run_pipeline(prefilter, prefilter_ticker, TickerSnapshot.prefetch_quarterly)
+    # Yahoo only has about five quarters, so every quarter seen is kept in the quarterly store until the year-ago TTM can be built
+    with METRICS.stage("store"):
+        quarterly_store = FundamentalsStore(QUARTERLY_STORE_DIR)
+        quarterly_store.add_statements(snapshots, QUARTERLY_ITEMS)
+        items = [name for names in QUARTERLY_ITEMS.values() for name in names]
+        panel = StatementPanel.from_long(quarterly_store.read(columns=items, tickers=list(snapshots)), items).with_tickers(list(snapshots))
+    with METRICS.stage("score"):
+        scores = ttm_f_scores(panel)["F-Score"]
+    results = {ticker: int(score) if score > 0 else "Data unavailable" for ticker, score in scores.items()}
+else:
+    # Tickers that pass the P/B check are scored right away while the check keeps running,
+    # the results keep the same order as the prefilter list
+    with METRICS.stage("fetch and score"):
+        results = run_pipeline(prefilter, prefilter_ticker, calculate_f_score)
+
 # Split companies by score groups
 score_groups = {}
 
@@ -207,8 +219,8 @@ for ticker, score in results.items():
         score_groups[score] = []
     score_groups[score].append(ticker)
 
-# Sort the score groups by score (from highest to lowest)
-sorted_score_groups = sorted(score_groups.items(), key=lambda x: x[0], reverse=True)
+# Sort the score groups by score (from highest to lowest), "Data unavailable" last
+sorted_score_groups = sorted(score_groups.items(), key=lambda x: x[0] if isinstance(x[0], int) else -1, reverse=True)
 
 # Display the sorted groups
 for score, tickers in sorted_score_groups:
@@ -217,4 +229,5 @@ for score, tickers in sorted_score_groups:
         print(f"  - {ticker}")
     print()
 print(sorted_score_groups)
+METRICS.finish()
 
@@ -1,31 +1,8 @@
-import yfinance as yf
+from input_session import InputSession
 
-print("F-Score Calculator [out of 9] (type 'exit' to end and list companies.)\n")
 
-# Dictionary to store the scores of all tickers
-all_scores = {}
-
-while True:
-    # Prompt the user to input a ticker symbol
-    user_input = input("Ticker: ").strip().upper()
-
-    # Exit the loop if the user types 'exit'
-    if user_input == 'EXIT':
-        if all_scores:
-            # Sort and display scores from greatest to lowest
-            print("\nAll F-Scores:")
-            sorted_scores = sorted(all_scores.items(), key=lambda x: x[1], reverse=True)
-            for ticker, score in sorted_scores:
-                print(f"{ticker}: {score}")
-        else:
-            print("No scores to display.")
-        print("\n*beep boop* Ending program *beep boo..*")
-        break
-    elif user_input == 'PBRATIO':
-        print("The Piotroski F-Score was originally intended only for companies that have a price to book ratio below 1. This is because the scoring system was designed to rule out 'value traps' and companies with high P/B ratios are typically not seen as value stocks at all")
-    # Analyze the single ticker
-    ticker = user_input
-    stock = yf.Ticker(ticker)
+def calculate_f_score(stock):
+    """F-Score of one company and whether its P/B ratio is above one (or unknown)."""
     score = 0  # Initialize the score for the company
 
     try:
@@ -146,14 +123,63 @@ while True:
 
     except (KeyError, IndexError, TypeError):
         pass  # Skip if data is unavailable
+    high_pb = False
     try:
         pb_ratio = stock.info.get('priceToBook', None)
         if pb_ratio is None or pb_ratio > 1 or pb_ratio < 0:
-            print(f"{ticker} has PB ratio above one (learn more by typing pbratio)")
+            high_pb = True
     except (KeyError, IndexError, TypeError):
-        pass    
-    # Store the final score in all_scores
-    all_scores[ticker] = score if score > 0 else "Data unavailable"
+        pass
+    return score, high_pb
+
+
+print("F-Score Calculator [out of 9] (type 'exit' to end and list companies.)")
+print("Paste several tickers at once separated by spaces or commas, type 'clear' to forget earlier scores.\n")
+
+# Scores of all tickers, including the ones scored in earlier sessions
+session = InputSession("fscore")
+all_scores = session.scores
+if all_scores:
+    print(f"Loaded {len(all_scores)} scores from the last session.\n")
+
+while True:
+    # Prompt the user to input one or more ticker symbols
+    user_input = input("Ticker(s): ").strip().upper()
+
+    # Exit the loop if the user types 'exit'
+    if user_input == 'EXIT':
+        session.close()
+        if all_scores:
+            # Sort and display scores from greatest to lowest
+            print("\nAll F-Scores:")
+            # ("Data unavailable" goes last, scores saved in earlier sessions can mix both)
+            sorted_scores = sorted(all_scores.items(), key=lambda x: x[1] if isinstance(x[1], int) else -1, reverse=True)
+            for ticker, score in sorted_scores:
+                print(f"{ticker}: {score}")
+        else:
+            print("No scores to display.")
+        print("\n*beep boop* Ending program *beep boo..*")
+        break
+    elif user_input == 'PBRATIO':
+        print("The Piotroski F-Score was originally intended only for companies that have a price to book ratio below 1. This is because the scoring system was designed to rule out 'value traps' and companies with high P/B ratios are typically not seen as value stocks at all")
+        continue
+    elif user_input == 'CLEAR':
+        session.clear()
+        print("Earlier scores cleared.\n")
+        continue
+
+    # Every ticker starts downloading as soon as it is read, scoring waits for each in turn
+    tickers = session.read(user_input)
+    results = session.score(tickers, calculate_f_score)
+
+    for ticker in tickers:
+        score, high_pb = results.get(ticker, (0, False))
+        if high_pb:
+            print(f"{ticker} has PB ratio above one (learn more by typing pbratio)")
+        # Store the final score in all_scores
+        all_scores[ticker] = score if score > 0 else "Data unavailable"
 
-    # Display the result
-    print(f"{ticker}: {all_scores[ticker]}\n")
+        # Display the result
+        print(f"{ticker}: {all_scores[ticker]}")
+    print()
+    session.save()
@@ -1,60 +1,82 @@
-import yfinance as yf
+from input_session import InputSession
 
-print("Magic Formula Calculator (type 'exit' to end and list companies.)\n")
 
-# Dictionary to store the scores of all tickers
-all_scores = {}
+def calculate_magic_formula(stock):
+    """(EBIT/EV, ROCE) of one company."""
+    # Get the relevant financial data
+    ebit = stock.financials.loc['EBIT', :].dropna().iloc[0]
+    total_debt = stock.balance_sheet.loc['Total Debt', :].fillna(0).iloc[0]
+    cash = stock.balance_sheet.loc['Cash And Cash Equivalents', :].fillna(0).iloc[0]
+    market_cap = stock.info.get('marketCap', None)
+    total_assets = stock.balance_sheet.loc['Total Assets', :].dropna().iloc[0]
+    current_liabilities = stock.balance_sheet.loc['Current Liabilities', :].dropna().iloc[0]
+
+    if market_cap is None:
+        raise ValueError("Market capitalization data is unavailable.")
+
+    # Calculate Enterprise Value (EV)
+    ev = market_cap + total_debt - cash
+
+    # Calculate EBIT/EV
+    ebit_ev = ebit / ev if ev > 0 else 0
+
+    # Calculate Return on Capital Employed (ROCE)
+    capital_employed = total_assets - current_liabilities
+    ebit_roce = ebit / capital_employed if capital_employed > 0 else 0
+
+    return ebit_ev, ebit_roce
+
+
+print("Magic Formula Calculator (type 'exit' to end and list companies.)")
+print("Paste several tickers at once separated by spaces or commas, type 'clear' to forget earlier scores.\n")
+
+# Scores of all tickers, including the ones scored in earlier sessions
+session = InputSession("magic_formula")
+all_scores = session.scores
+if all_scores:
+    print(f"Loaded {len(all_scores)} scores from the last session.\n")
 
 while True:
-    # Prompt the user to input a ticker symbol
-    user_input = input("Ticker: ").strip().upper()
+    # Prompt the user to input one or more ticker symbols
+    user_input = input("Ticker(s): ").strip().upper()
 
     # Exit the loop if the user types 'exit'
     if user_input == 'EXIT':
+        session.close()
         if all_scores:
             # Sort and display scores from greatest to lowest based on the total score (EBIT/EV + EBIT/ROCE)
             print("\nAll Magic Formula Scores (sorted by total score):")
-            sorted_scores = sorted(all_scores.items(), key=lambda x: (x[1][0] + x[1][1]), reverse=True)
+            # ("Data unavailable" goes last, scores saved in earlier sessions can mix both)
+            available = lambda x: not isinstance(x[1][0], str)
+            sorted_scores = sorted(all_scores.items(), key=lambda x: (x[1][0] + x[1][1]) if available(x) else float("-inf"), reverse=True)
             for ticker, (ebit_ev, ebit_roce) in sorted_scores:
+                if isinstance(ebit_ev, str):
+                    print(f"{ticker}: {ebit_ev}")
+                    continue
                 total_score = ebit_ev + ebit_roce  # Sum of EBIT/EV and EBIT/ROCE for each company
                 print(f"{ticker}: Total = {total_score:.4f}")
         else:
             print("No scores to display.")
         print("\n*beep boop* Ending program *beep boo..*")
         break
+    elif user_input == 'CLEAR':
+        session.clear()
+        print("Earlier scores cleared.\n")
+        continue
 
-    # Analyze the single ticker
-    ticker = user_input
-    stock = yf.Ticker(ticker)
+    # Every ticker starts downloading as soon as it is read, scoring waits for each in turn (errors are printed and skipped)
+    tickers = session.read(user_input)
+    results = session.score(tickers, calculate_magic_formula)
 
-    try:
-        # Get the relevant financial data
-        ebit = stock.financials.loc['EBIT', :].dropna().iloc[0]
-        total_debt = stock.balance_sheet.loc['Total Debt', :].fillna(0).iloc[0]
-        cash = stock.balance_sheet.loc['Cash And Cash Equivalents', :].fillna(0).iloc[0]
-        market_cap = stock.info.get('marketCap', None)
-        total_assets = stock.balance_sheet.loc['Total Assets', :].dropna().iloc[0]
-        current_liabilities = stock.balance_sheet.loc['Current Liabilities', :].dropna().iloc[0]
+    for ticker in tickers:
+        if ticker in results:
+            # Store the scores
+            all_scores[ticker] = results[ticker]
+            ebit_ev, ebit_roce = results[ticker]
 
-        if market_cap is None:
-            raise ValueError("Market capitalization data is unavailable.")
-
-        # Calculate Enterprise Value (EV)
-        ev = market_cap + total_debt - cash
-
-        # Calculate EBIT/EV
-        ebit_ev = ebit / ev if ev > 0 else 0
-
-        # Calculate Return on Capital Employed (ROCE)
-        capital_employed = total_assets - current_liabilities
-        ebit_roce = ebit / capital_employed if capital_employed > 0 else 0
-
-        # Store the scores
-        all_scores[ticker] = (ebit_ev, ebit_roce)
-
-        # Display the result for the current ticker
-        print(f"{ticker}: EBIT/EV = {ebit_ev:.4f}, ROCE = {ebit_roce:.4f}\n")
-
-    except (KeyError, IndexError, TypeError, ValueError) as e:
-        print(f"Error processing {ticker}: {e}\n")
-        all_scores[ticker] = ("Data unavailable", "Data unavailable")
+            # Display the result for the current ticker
+            print(f"{ticker}: EBIT/EV = {ebit_ev:.4f}, ROCE = {ebit_roce:.4f}")
+        else:
+            all_scores[ticker] = ("Data unavailable", "Data unavailable")
+    print()
+    session.save()
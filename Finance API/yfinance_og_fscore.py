@@ -1,4 +1,4 @@
-import yfinance as yf
+from ticker_snapshot import TickerSnapshot
 
 # Define the list of ticker symbols for the companies you want to analyze
 '''tickers = [
@@ -32,21 +32,20 @@ tickers = [ "AAPL", "ASR", "CLW","GOOG","CRM", "AVGO", "ALSN", "GASS","AMC","GME
 
   # Add or replace with the companies you want
 
-# Dictionary to store results
-results = {}
-
-# Loop through each ticker symbol
-for ticker in tickers:
-    # Download the stock's information
-    stock = yf.Ticker(ticker)
+# Calculate the F-Score of a single ticker
+def calculate_f_score(snapshot):
+    # Take each statement from the snapshot once, all nine signals reuse them
+    financials = snapshot.financials
+    balance_sheet = snapshot.balance_sheet
+    cashflow = snapshot.cashflow
     score = 0  # Initialize the score for each company
 
     try:
         # Calculate ROA for the last two years and current operating cash flow
-        roa = stock.financials.loc['Net Income'] / stock.balance_sheet.loc['Total Assets']
+        roa = financials.loc['Net Income'] / balance_sheet.loc['Total Assets']
         roa = roa.dropna()  # Remove any null values to avoid errors
         roa =  roa.sort_index(ascending=False)
-        cfo = stock.cashflow.loc['Operating Cash Flow'].dropna().iloc[0]  # Most recent non-null CFO
+        cfo = cashflow.loc['Operating Cash Flow'].dropna().iloc[0]  # Most recent non-null CFO
 
         if len(roa) >= 2:
             current_roa = roa.iloc[0]  # Most recent ROA
@@ -72,7 +71,7 @@ for ticker in tickers:
 
     try:
         # Calculate the current ratio for the last two years
-        current_ratio = stock.balance_sheet.loc['Current Assets'] / stock.balance_sheet.loc['Current Liabilities']
+        current_ratio = balance_sheet.loc['Current Assets'] / balance_sheet.loc['Current Liabilities']
         current_ratio = current_ratio.dropna()
         current_ratio =  current_ratio.sort_index(ascending=False)
 
@@ -89,8 +88,8 @@ for ticker in tickers:
 
     try:
         # Calculate the long-term debt to total assets ratio for the last two years
-        long_term_debt = stock.balance_sheet.loc['Long Term Debt']
-        total_assets = stock.balance_sheet.loc['Total Assets']
+        long_term_debt = balance_sheet.loc['Long Term Debt']
+        total_assets = balance_sheet.loc['Total Assets']
         long_term_debt_to_assets = long_term_debt / total_assets
         long_term_debt_to_assets = long_term_debt_to_assets.dropna()
         long_term_debt_to_assets =  long_term_debt_to_assets.sort_index(ascending=False)
@@ -108,7 +107,7 @@ for ticker in tickers:
 
     try:
         # Get the number of shares outstanding for the last two years
-        shares_outstanding = stock.balance_sheet.loc['Ordinary Shares Number']
+        shares_outstanding = balance_sheet.loc['Ordinary Shares Number']
         shares_outstanding = shares_outstanding.dropna()
         shares_outstanding = shares_outstanding.sort_index(ascending=False)
 
@@ -125,8 +124,8 @@ for ticker in tickers:
 
     try:
         # Calculate the gross margin ratio for the last two years
-        gross_profit = stock.financials.loc['Gross Profit']
-        total_revenue = stock.financials.loc['Total Revenue']
+        gross_profit = financials.loc['Gross Profit']
+        total_revenue = financials.loc['Total Revenue']
         gross_profit = gross_profit.dropna()
         total_revenue = total_revenue.dropna()
         gross_margin = gross_profit / total_revenue
@@ -145,9 +144,9 @@ for ticker in tickers:
     
     try:
         # Calculate the asset turnover ratio for the last two years
-        total_revenue = stock.financials.loc['Total Revenue']
-        total_assets = stock.balance_sheet.loc['Total Assets']
-        asset_turnover = stock.financials.loc['Total Revenue'] / stock.balance_sheet.loc['Total Assets']
+        total_revenue = financials.loc['Total Revenue']
+        total_assets = balance_sheet.loc['Total Assets']
+        asset_turnover = total_revenue / total_assets
         asset_turnover = asset_turnover.dropna()
         asset_turnover =  asset_turnover.sort_index(ascending=False)
         if len(asset_turnover) >= 2:
@@ -160,9 +159,16 @@ for ticker in tickers:
     except (KeyError, IndexError, TypeError):
         pass  # Skip if data is unavailable
     
-    # Store the final score in results
-    results[ticker] = score if score > 0 else "Data unavailable"
-    
+    # Return the final score
+    return score if score > 0 else "Data unavailable"
+
+# Dictionary to store results
+results = {}
+
+# Loop through each ticker symbol
+for ticker in tickers:
+    results[ticker] = calculate_f_score(TickerSnapshot(ticker))
+
 # Split companies by score groups
 score_groups = {}
 
@@ -172,8 +178,8 @@ for ticker, score in results.items():
         score_groups[score] = []
     score_groups[score].append(ticker)
 
-# Sort the score groups by score (from highest to lowest)
-sorted_score_groups = sorted(score_groups.items(), key=lambda x: x[0], reverse=True)
+# Sort the score groups by score (from highest to lowest), "Data unavailable" last
+sorted_score_groups = sorted(score_groups.items(), key=lambda x: x[0] if isinstance(x[0], int) else -1, reverse=True)
 
 # Display the sorted groups
 for score, tickers in sorted_score_groups:
@@ -4,6 +4,8 @@ import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
 
+from stock_features import BEATS_COLUMN, FeatureStore, info_features
+
 # Read S&P 500 tickers from a text file
 with open("s&p_500_tickers_real.txt", "r") as file:
     tickers = [line.strip() for line in file.readlines() if line.strip()]
@@ -12,72 +14,70 @@ with open("s&p_500_tickers_real.txt", "r") as file:
 end_date = datetime.now().replace(month=1, day=1) - timedelta(days=1)  # Dec 31 of last year
 start_date = end_date.replace(year=end_date.year - 1)
 
-# Placeholder for data
-data = []
-
-# Fetch data for each ticker
-for ticker in tickers:
-    try:
-        stock = yf.Ticker(ticker)
-        sp500 = yf.Ticker("^GSPC")  # S&P 500 index
-
-        # Get historical price data
-        history = stock.history(start=start_date.strftime('%Y-%m-%d'), end=end_date.strftime('%Y-%m-%d'))
-        sp500_history = sp500.history(start=start_date.strftime('%Y-%m-%d'), end=end_date.strftime('%Y-%m-%d'))
-
-        # Calculate price change over the year
-        price_start = history['Close'].iloc[0]
-        price_end = history['Close'].iloc[-1]
-        price_change = (price_end - price_start) / price_start
-
-        # S&P 500 performance
-        sp500_start = sp500_history['Close'].iloc[0]
-        sp500_end = sp500_history['Close'].iloc[-1]
-        sp500_change = (sp500_end - sp500_start) / sp500_start
-
-        # Determine if the stock beat the S&P 500
-        beat_sp500 = 1 if price_change > sp500_change else 0
-
-        # Retrieve stock financial data
-        info = stock.info
-        financials = stock.financials
-        balance_sheet = stock.balance_sheet
-        cashflow = stock.cashflow
-
-        data.append({
-            "Ticker": ticker,
-            "Price Change Last Year": price_change,
-            "S&P 500 Change Last Year": sp500_change,
-            "Beats S&P 500 (1=yes, 0=no)": beat_sp500,
-            "Price-to-Book Ratio (P/B)": info.get("priceToBook"),
-            "Price-to-Sales Ratio (P/S)": info.get("priceToSalesTrailing12Months"),
-            "Enterprise Value to EBITDA": info.get("enterpriseToEbitda"),
-            "Enterprise Value to Revenue": info.get("enterpriseToRevenue"),
-            "Trailing P/E Ratio": info.get("trailingPE"),
-            "Forward P/E Ratio": info.get("forwardPE"),
-            "PEG Ratio": info.get("trailingPegRatio"),
-            "Gross Margin": info.get("grossMargins"),
-            "EBITDA Margin": info.get("ebitdaMargins"),
-            "Operating Margin": info.get("operatingMargins"),
-            "Net Profit Margin": info.get("profitMargins"),
-            "Return on Assets (ROA)": info.get("returnOnAssets"),
-            "Return on Equity (ROE)": info.get("returnOnEquity"),
-            "Debt-to-Equity Ratio": info.get("debtToEquity"),
-            "Current Ratio": info.get("currentRatio"),
-            "Quick Ratio": info.get("quickRatio"),
-            "Revenue Growth": info.get("revenueGrowth"),
-            "Earnings Growth": info.get("earningsGrowth"),
-            "Short Ratio": info.get("shortRatio"),
-            "Dividend Yield": info.get("dividendYield"),
-            "Payout Ratio": info.get("payoutRatio"),
-        })
-
-    except Exception as e:
-        print(f"Error fetching data for {ticker}: {e}")
-
-# Create a DataFrame
-df = pd.DataFrame(data)
-
-# Save to CSV
-df.to_csv("stock_financial_analysis.csv", index=False)
-print("Dataset saved to 'stock_financial_analysis.csv'")
+# Tickers are handled in batches: one request for the closing prices of the whole batch, then the data of each ticker
+BATCH_SIZE = 100
+
+def download_closes(batch, **kwargs):
+    close = yf.download(batch, auto_adjust=True, progress=False, threads=True, **kwargs)["Close"]
+    return close.to_frame(batch[0]) if isinstance(close, pd.Series) else close
+
+# Rows are written as soon as each ticker is done. An interrupted run for the same year resumes with the tickers it hadn't finished
+LABELS = ["Price Change Last Year", "S&P 500 Change Last Year", BEATS_COLUMN]
+output = FeatureStore("stock_financial_analysis.features", LABELS, run_key=f"{start_date:%Y-%m-%d}:{end_date:%Y-%m-%d}")
+remaining = output.remaining(tickers)
+if len(remaining) < len(tickers):
+    print(f"Resuming: {len(tickers) - len(remaining)} tickers already saved, {len(remaining)} to go")
+
+sp500_history = yf.Ticker("^GSPC").history(start=start_date.strftime('%Y-%m-%d'), end=end_date.strftime('%Y-%m-%d'))  # S&P 500 index, fetched only once
+
+# S&P 500 performance
+sp500_start = sp500_history['Close'].iloc[0]
+sp500_end = sp500_history['Close'].iloc[-1]
+sp500_change = (sp500_end - sp500_start) / sp500_start
+
+# Tickers whose request failed, a rerun retries only these
+failed = []
+
+for start in range(0, len(remaining), BATCH_SIZE):
+    batch = remaining[start:start + BATCH_SIZE]
+
+    # Get last year's prices for the batch in one request, and every stock's price change from its first and last close
+    closes = download_closes(batch, start=start_date.strftime('%Y-%m-%d'), end=end_date.strftime('%Y-%m-%d'))
+    price_changes = (closes.ffill().iloc[-1] - closes.bfill().iloc[0]) / closes.bfill().iloc[0]
+
+    # Fetch data for each ticker
+    for ticker in batch:
+        try:
+            price_change = price_changes.get(ticker)
+
+            if price_change is None or pd.isna(price_change):
+                print(f"Error fetching data for {ticker}: no price history")
+                # Yahoo leaves a ticker out of a batch download when that request failed too, so it is retried like any other error
+                failed.append(ticker)
+                continue
+
+            stock = yf.Ticker(ticker)
+
+            # Determine if the stock beat the S&P 500
+            beat_sp500 = 1 if price_change > sp500_change else 0
+
+            # Retrieve stock financial data
+            info = stock.info
+
+            output.write(ticker, info_features(info), {
+                "Price Change Last Year": price_change,
+                "S&P 500 Change Last Year": sp500_change,
+                BEATS_COLUMN: beat_sp500,
+            })
+
+        except Exception as e:
+            print(f"Error fetching data for {ticker}: {e}")
+            failed.append(ticker)
+
+# Every row is already on disk. The run stays unfinished while some tickers failed, otherwise the next run starts a new store
+if failed:
+    output.close()
+    print(f"Dataset saved to 'stock_financial_analysis.features' without {len(failed)} tickers, run again to fetch only those")
+else:
+    output.finish()
+    print("Dataset saved to 'stock_financial_analysis.features'")
@@ -0,0 +1,214 @@
+# Feature definitions and on-disk store shared by the market data collectors and AI/tensorflow_stock_neural_network.py.
+# FEATURES is the one list of model inputs: current_market_data.py and prev_years_market_data.py fill it from yfinance's info,
+# Finance API/dataset_builder.py rebuilds the same columns point-in-time, and the model reads them back in the same order.
+#
+# A store is a folder of raw float32 files, so loading it is a memory map with nothing to parse:
+#   meta.json      schema version, feature and label columns, run key and whether the run finished
+#   tickers.txt    one ticker per row
+#   features.f32   (rows x features) float32, NaN where yfinance had no value
+#   labels.f32     (rows x labels) float32, the price changes and the beat-the-index label (and the year of a panel)
+# Rows are appended and flushed one at a time, the ticker last, so an interrupted run with the same run key resumes where it stopped.
+# Bump SCHEMA_VERSION whenever FEATURES changes: stores written with another schema are refused instead of silently misaligned.
+
+import json
+import math
+import os
+from collections import namedtuple
+
+import numpy as np
+
+SCHEMA_VERSION = 1
+
+# (column, yfinance info key)
+FEATURES = [
+    ("Price-to-Book Ratio (P/B)", "priceToBook"),
+    ("Price-to-Sales Ratio (P/S)", "priceToSalesTrailing12Months"),
+    ("Enterprise Value to EBITDA", "enterpriseToEbitda"),
+    ("Enterprise Value to Revenue", "enterpriseToRevenue"),
+    ("Trailing P/E Ratio", "trailingPE"),
+    ("Forward P/E Ratio", "forwardPE"),
+    ("PEG Ratio", "trailingPegRatio"),
+    ("Gross Margin", "grossMargins"),
+    ("EBITDA Margin", "ebitdaMargins"),
+    ("Operating Margin", "operatingMargins"),
+    ("Net Profit Margin", "profitMargins"),
+    ("Return on Assets (ROA)", "returnOnAssets"),
+    ("Return on Equity (ROE)", "returnOnEquity"),
+    ("Debt-to-Equity Ratio", "debtToEquity"),
+    ("Current Ratio", "currentRatio"),
+    ("Quick Ratio", "quickRatio"),
+    ("Revenue Growth", "revenueGrowth"),
+    ("Earnings Growth", "earningsGrowth"),
+    ("Short Ratio", "shortRatio"),
+    ("Dividend Yield", "dividendYield"),
+    ("Payout Ratio", "payoutRatio"),
+]
+FEATURE_COLUMNS = [column for column, _ in FEATURES]
+
+# Columns Yahoo only has for today (estimates and short interest): a point-in-time panel can't rebuild them, so a model
+# trained on one has to leave them out of its inputs when it scores today's data too
+TODAY_ONLY_COLUMNS = ["Forward P/E Ratio", "PEG Ratio", "Short Ratio"]
+
+BEATS_COLUMN = "Beats S&P 500 (1=yes, 0=no)"
+
+DTYPE = np.float32
+
+FeatureSet = namedtuple("FeatureSet", ["tickers", "features", "labels", "meta"])
+
+
+def to_float(value):
+    """A number for the store, NaN for anything yfinance left out or sent as text ('Infinity', None...)."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return value if math.isfinite(value) else math.nan
+
+
+def info_features(info):
+    """The FEATURES of one ticker's yfinance info, in column order."""
+    return np.array([to_float(info.get(key)) for _, key in FEATURES], dtype=DTYPE)
+
+
+def _read_meta(path):
+    try:
+        with open(os.path.join(path, "meta.json"), "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _row_count(path, meta):
+    """Rows that made it to every file, a row cut off mid-write isn't counted."""
+    size = DTYPE().itemsize
+    try:
+        with open(os.path.join(path, "tickers.txt"), "rb") as file:
+            counts = [file.read().count(b"\n")]
+        counts.append(os.path.getsize(os.path.join(path, "features.f32")) // (len(meta["features"]) * size))
+        if meta["labels"]:
+            counts.append(os.path.getsize(os.path.join(path, "labels.f32")) // (len(meta["labels"]) * size))
+    except OSError:
+        return 0
+    return min(counts)
+
+
+class FeatureStore:
+    """Writes one store, resuming an unfinished run with the same run key and starting over otherwise."""
+
+    def __init__(self, path, labels, run_key, resume=True):
+        self.path = path
+        self.labels = list(labels)
+        self.run_key = str(run_key)
+        self.meta = {
+            "version": SCHEMA_VERSION,
+            "features": FEATURE_COLUMNS,
+            "labels": self.labels,
+            "run_key": self.run_key,
+            "complete": False,
+        }
+        os.makedirs(path, exist_ok=True)
+
+        existing = _read_meta(path) if resume else None
+        self.rows = _row_count(path, existing) if existing == self.meta else 0
+        if self.rows:
+            self.tickers = self._truncate(self.rows)
+            mode = "ab"
+        else:
+            self.tickers = []
+            mode = "wb"
+        self._write_meta()
+
+        self._tickers = open(os.path.join(path, "tickers.txt"), mode)
+        self._features = open(os.path.join(path, "features.f32"), mode)
+        self._labels = open(os.path.join(path, "labels.f32"), mode)
+        self.done = set(self.tickers)
+
+    def _truncate(self, rows):
+        """Cut every file back to the rows they all have and return their tickers."""
+        with open(os.path.join(self.path, "tickers.txt"), "rb+") as file:
+            lines = file.read().split(b"\n")[:rows]
+            file.seek(0)
+            file.truncate(sum(len(line) + 1 for line in lines))
+        size = DTYPE().itemsize
+        for name, width in (("features.f32", len(FEATURE_COLUMNS)), ("labels.f32", len(self.labels))):
+            with open(os.path.join(self.path, name), "rb+") as file:
+                file.truncate(rows * width * size)
+        return [line.decode() for line in lines]
+
+    def _write_meta(self):
+        tmp_path = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(self.meta, file)
+        os.replace(tmp_path, os.path.join(self.path, "meta.json"))
+
+    def remaining(self, tickers):
+        """The tickers that still have to be fetched, in their original order."""
+        return [ticker for ticker in tickers if ticker not in self.done]
+
+    def write(self, ticker, features, labels):
+        """Append one row: its FEATURES (see info_features) and {label column: value}."""
+        row = [[to_float(labels[name]) for name in self.labels]]
+        self.write_many([ticker], np.reshape(features, (1, -1)), row)
+
+    def write_many(self, tickers, features, labels):
+        """Append a block of rows: (rows x features) and (rows x labels) arrays, the labels in the store's order."""
+        features = np.ascontiguousarray(features, dtype=DTYPE)
+        labels = np.ascontiguousarray(labels, dtype=DTYPE).reshape(len(tickers), len(self.labels))
+        if features.shape != (len(tickers), len(FEATURE_COLUMNS)):
+            raise ValueError(f"expected {len(tickers)} rows of {len(FEATURE_COLUMNS)} features, got {features.shape}")
+
+        self._features.write(features.tobytes())
+        self._labels.write(labels.tobytes())
+        self._features.flush()
+        self._labels.flush()
+        # The ticker goes last, a row only counts once it is there
+        self._tickers.write("".join(f"{ticker}\n" for ticker in tickers).encode())
+        self._tickers.flush()
+
+        self.tickers.extend(tickers)
+        self.done.update(tickers)
+        self.rows += len(tickers)
+
+    def finish(self):
+        """Close the store and mark the run finished, the next run starts a new one."""
+        self.close()
+        self.meta["complete"] = True
+        self._write_meta()
+
+    def close(self):
+        self._tickers.close()
+        self._features.close()
+        self._labels.close()
+
+
+def write_features(path, tickers, features, labels, label_columns, run_key=""):
+    """Write a whole store at once, replacing whatever was at `path`."""
+    store = FeatureStore(path, label_columns, run_key, resume=False)
+    store.write_many(list(tickers), features, labels)
+    store.finish()
+
+
+def load_features(path):
+    """
+    Memory-map a store. The features come back as a read-only (rows x FEATURE_COLUMNS) float32 array and the labels as
+    {column: float32 array}. A store written with another schema raises ValueError, its columns wouldn't line up with the model's.
+    """
+    meta = _read_meta(path)
+    if meta is None:
+        raise FileNotFoundError(f"no feature store at '{path}'")
+    if meta.get("version") != SCHEMA_VERSION or meta.get("features") != FEATURE_COLUMNS:
+        raise ValueError(f"'{path}' has feature schema v{meta.get('version')}, expected v{SCHEMA_VERSION}: collect it again")
+
+    rows = _row_count(path, meta)
+    with open(os.path.join(path, "tickers.txt"), "r") as file:
+        tickers = file.read().split("\n")[:rows]
+
+    def mapped(name, width):
+        if rows == 0 or width == 0:
+            return np.empty((rows, width), dtype=DTYPE)
+        return np.memmap(os.path.join(path, name), dtype=DTYPE, mode="r", shape=(rows, width))
+
+    features = mapped("features.f32", len(FEATURE_COLUMNS))
+    label_block = mapped("labels.f32", len(meta["labels"]))
+    labels = {name: label_block[:, i] for i, name in enumerate(meta["labels"])}
+    return FeatureSet(tickers, features, labels, meta)